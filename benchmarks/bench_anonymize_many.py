@@ -0,0 +1,46 @@
+"""
+Throughput of Anonymizer.anonymize_many with a growing number of worker
+processes or threads, against anonymize called in a loop.
+
+Usage: python benchmarks/bench_anonymize_many.py [n_docs] [max_workers]
+"""
+
+import os
+import sys
+import time
+
+from incognito_anonymizer import Anonymizer
+from corpus import clinical_letters, personal_infos
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    docs = clinical_letters(n_docs)
+    documents = list(zip(docs, personal_infos(n_docs)))
+
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    ano.add_analyzer("pii")
+
+    start = time.perf_counter()
+    for text, info in documents:
+        ano.anonymize(text, info)
+    baseline = n_docs / (time.perf_counter() - start)
+    print(f"anonymize loop   {baseline:8.1f} docs/s")
+
+    for executor in ("process", "thread"):
+        workers = 1
+        while workers <= max_workers:
+            start = time.perf_counter()
+            for _ in ano.anonymize_many(documents, workers=workers, executor=executor):
+                pass
+            rate = n_docs / (time.perf_counter() - start)
+            print(f"{workers:3d} {executor:<8} {rate:12.1f} docs/s  x{rate / baseline:.2f}")
+            if workers == max_workers:
+                break
+            workers = min(workers * 2, max_workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Event loop latency while anonymizing documents from coroutines, calling
+anonymize inline against awaiting anonymize_async.
+
+A ticker coroutine sleeps 1ms in a loop and records how late it wakes up.
+
+Usage: python benchmarks/bench_async.py [n_docs] [sentences] [concurrency]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from incognito_anonymizer import Anonymizer
+from corpus import clinical_letters, personal_infos
+
+
+async def ticker(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def run(ano, documents, concurrency, inline):
+    lags = []
+    stop = asyncio.Event()
+    tick = asyncio.ensure_future(ticker(lags, stop))
+    queue = asyncio.Queue()
+    for document in documents:
+        queue.put_nowait(document)
+
+    async def client():
+        while not queue.empty():
+            text, info = queue.get_nowait()
+            if inline:
+                ano.anonymize(text, info)
+                await asyncio.sleep(0)
+            else:
+                await ano.anonymize_async(text, info)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    return elapsed, lags
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sentences = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    documents = list(zip(clinical_letters(n_docs, sentences=sentences), personal_infos(n_docs)))
+
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    ano.add_analyzer("pii")
+    for inline in (True, False):
+        elapsed, lags = asyncio.run(run(ano, documents, concurrency, inline))
+        lags = sorted(lags) or [0.0]
+        print(
+            f"{'inline' if inline else 'anonymize_async':<16} {n_docs / elapsed:8.1f} docs/s"
+            f"  loop lag p50 {statistics.median(lags) * 1e3:6.2f}ms"
+            f"  p99 {lags[int(len(lags) * 0.99)] * 1e3:6.2f}ms  max {lags[-1] * 1e3:6.2f}ms"
+        )
+    ano.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Documents/sec of the Doccano output of a corpus: one append-mode open and
+json.dumps per document as in the CLI, against DoccanoWriter with a single
+buffered handle, plain and gzip compressed. The spans are computed
+beforehand so that only the writing is timed, then annotate_corpus is
+timed end to end.
+
+Usage: python benchmarks/bench_doccano.py [n_docs]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+from incognito_anonymizer import Anonymizer, anotate
+from corpus import clinical_letters, personal_infos
+
+
+def append_per_document(annotated, path):
+    doccano = anotate.DoccanoStrategy()
+    for text, spans in annotated:
+        annotated_text = doccano.annotate(text, spans)
+        output = open(path, "a")
+        output.write("\n" + annotated_text)
+        output.close()
+
+
+def single_handle(annotated, path):
+    with anotate.DoccanoWriter(path) as writer:
+        for text, spans in annotated:
+            writer.write(text, spans)
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    documents = list(zip(clinical_letters(n_docs), personal_infos(n_docs)))
+    warnings.simplefilter("ignore")
+
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    ano.add_analyzer("pii")
+    annotated = []
+    for text, infos in documents:
+        spans = {}
+        for strategy in ano._analyzers:
+            spans.update(strategy.analyze(text=text, info=infos))
+        annotated.append((text, spans))
+
+    with tempfile.TemporaryDirectory() as directory:
+        runs = [
+            ("append per document", "append.jsonl", lambda path: append_per_document(annotated, path)),
+            ("single handle", "corpus.jsonl", lambda path: single_handle(annotated, path)),
+            ("single handle gzip", "corpus.jsonl.gz", lambda path: single_handle(annotated, path)),
+            ("annotate_corpus", "full.jsonl", lambda path: ano.annotate_corpus(documents, path)),
+        ]
+        for name, filename, run in runs:
+            path = os.path.join(directory, filename)
+            start = time.perf_counter()
+            run(path)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(path) / 2**20
+            print(f"{name:<20} {n_docs / elapsed:10.1f} docs/s {size:8.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Memory and docs/sec of the entity capture: former list of DetectedEntity,
+EntityTable, and capture switched off.
+
+Usage: python benchmarks/bench_entities.py [n_docs] [sentences]
+"""
+
+import sys
+import time
+import tracemalloc
+import warnings
+
+from incognito_anonymizer import Anonymizer, DetectedEntity
+from corpus import clinical_letters, personal_infos
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    sentences = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    docs = clinical_letters(n_docs, sentences=sentences)
+    infos = personal_infos(n_docs)
+    warnings.simplefilter("ignore")
+
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    ano.add_analyzer("pii")
+
+    # mémoire des entités gardées pour tout le lot, documents exclus ; en
+    # séquentiel la table garde aussi le texte masqué par le 1er analyzer
+    for pipeline in Anonymizer.PIPELINES:
+        ano.set_pipeline(pipeline)
+        tables = [ano.anonymize_with_entities(text, info)[1] for text, info in zip(docs, infos)]
+        n_entities = sum(map(len, tables))
+        for name in ("DetectedEntity list", "EntityTable"):
+            tracemalloc.start()
+            if name == "EntityTable":
+                kept = [ano.anonymize_with_entities(text, info)[1] for text, info in zip(docs, infos)]
+            else:
+                kept = [[DetectedEntity(*row) for row in table.rows()] for table in tables]
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del kept
+            print(f"{pipeline:<12} {name:<20} {memory / n_entities:8.1f} bytes/entity")
+    ano.set_pipeline("sequential")
+
+    for capture in (True, False):
+        ano.set_entity_capture(capture)
+        start = time.perf_counter()
+        for text, info in zip(docs, infos):
+            ano.anonymize(text, info)
+        elapsed = time.perf_counter() - start
+        print(f"capture={capture!s:<6} {n_docs / elapsed:8.1f} docs/s")
+
+
+if __name__ == "__main__":
+    main()
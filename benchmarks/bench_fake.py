@@ -0,0 +1,55 @@
+"""
+Docs/sec and entities/sec of the fake mask (surrogates) against the
+placeholder mask, on the spans found in the synthetic clinical letters.
+
+Usage: python benchmarks/bench_fake.py [n_docs] [sentences]
+"""
+
+import sys
+import time
+import warnings
+
+from incognito_anonymizer import Anonymizer, mask
+from corpus import clinical_letters, personal_infos
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    sentences = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    docs = clinical_letters(n_docs, sentences=sentences)
+    infos = personal_infos(n_docs)
+    warnings.simplefilter("ignore")
+
+    # spans calculés une fois : seul le masquage est mesuré
+    ano = Anonymizer()
+    ano.set_pipeline("single_pass")
+    for name in ("regex", "pii"):
+        ano.add_analyzer(name)
+    spans = [
+        ano._merge_spans([strategy.analyze(text=text, info=info) for strategy in ano._analyzers])
+        for text, info in zip(docs, infos)
+    ]
+    n_entities = sum(len(s) for s in spans)
+
+    strategies = [
+        ("placeholder", mask.PlaceholderStrategy(), {}),
+        ("fake fixed", mask.FakeStrategy(surrogates=False), {}),
+        ("fake", mask.FakeStrategy(seed="secret"), {"infos": None}),
+        ("fake no cache", mask.FakeStrategy(seed="secret", cache_size=0), {"infos": None}),
+    ]
+    for name, strategy, kwargs in strategies:
+        for _ in range(2):
+            start = time.perf_counter()
+            for text, info, coordinate in zip(docs, infos, spans):
+                if kwargs:
+                    kwargs["infos"] = info
+                strategy.mask(text, coordinate, **kwargs)
+            elapsed = time.perf_counter() - start
+        print(
+            f"{name:<14} {n_docs / elapsed:9.1f} docs/s "
+            f"{n_entities / elapsed / 1e3:8.1f} k entities/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
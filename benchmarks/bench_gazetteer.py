@@ -0,0 +1,55 @@
+"""
+Build time, memory and docs/sec of PiiStrategy with a cohort gazetteer
+of growing size.
+
+Usage: python benchmarks/bench_gazetteer.py [sizes...]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+from incognito_anonymizer import analyzer
+from corpus import FIRST_NAMES, LAST_NAMES, clinical_letters
+
+
+def identifiers(n, seed=0):
+    """`n` distinct names and IPP numbers."""
+    rng = random.Random(seed)
+    for i in range(n):
+        if i % 2:
+            yield str(10**9 + i), "<IPP>"
+        else:
+            yield f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{i:07d}", "<NAME>"
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    docs = clinical_letters(200)
+    infos = [None] * len(docs)
+
+    for size in sizes:
+        tracemalloc.start()
+        start = time.perf_counter()
+        gazetteer = analyzer.Gazetteer(identifiers(size))
+        build = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        strategy = analyzer.PiiStrategy(gazetteer=gazetteer)
+        # premier passage : le gc parcourt une fois le trie fraîchement construit
+        for text, info in zip(docs, infos):
+            strategy.analyze(text, info)
+        start = time.perf_counter()
+        for text, info in zip(docs, infos):
+            strategy.analyze(text, info)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{size:>9} entries  build {build:7.2f}s  {memory / 2**20:8.1f} MiB"
+            f"  {len(docs) / elapsed:8.1f} docs/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Entities/sec of the hash mask against the placeholder mask, on documents
+where the same identifiers come back (cache hits) or are all distinct.
+
+Usage: python benchmarks/bench_hash.py [n_docs] [spans_per_doc]
+"""
+
+import random
+import sys
+import time
+
+from incognito_anonymizer import mask
+from corpus import FIRST_NAMES, LAST_NAMES
+
+
+def document(n_spans, pool, rng):
+    """Text of `n_spans` identifiers drawn from `pool`, with their coordinates."""
+    pieces, spans, position = [], [], 0
+    for _ in range(n_spans):
+        word = rng.choice(pool)
+        pieces.append(word + " a consulté le ")
+        spans.append((position, position + len(word)))
+        position += len(word) + len(" a consulté le ")
+    return "".join(pieces), {tuple(spans): "<NAME>"}
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_spans = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(0)
+    # identifiants qui reviennent d'un document à l'autre
+    pool = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{i}" for i in range(5000)]
+    docs = [document(n_spans, pool, rng) for _ in range(n_docs)]
+    n_entities = n_docs * n_spans
+
+    strategies = [
+        ("placeholder", mask.PlaceholderStrategy()),
+        ("hash", mask.HashStrategy(key="secret")),
+        ("hash no cache", mask.HashStrategy(key="secret", cache_size=0)),
+    ]
+    for name, strategy in strategies:
+        start = time.perf_counter()
+        for text, coordinate in docs:
+            strategy.mask(text, coordinate)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<16} {n_entities / elapsed / 1e6:6.2f} M entities/s")
+
+    # mots tous différents : uniquement des calculs de hash
+    strategy = mask.HashStrategy(key="secret")
+    words = [f"{rng.random():.12f}" for _ in range(n_entities)]
+    start = time.perf_counter()
+    strategy.digests(words)
+    elapsed = time.perf_counter() - start
+    print(f"{'hash distinct':<16} {n_entities / elapsed / 1e6:6.2f} M words/s")
+
+
+if __name__ == "__main__":
+    main()
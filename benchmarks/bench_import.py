@@ -0,0 +1,68 @@
+"""
+Import time of the package and of the CLI, measured with
+`python -X importtime` in fresh interpreters, against a budget.
+
+The budgets are tracked here: lower them when an import gets faster, a
+change going over one has to be justified. The modules of `DEFERRED`
+must not be loaded by the import at all.
+
+Usage: python benchmarks/bench_import.py [runs]
+Exit status 1 when a budget is exceeded or a deferred module is loaded.
+"""
+
+import subprocess
+import sys
+
+# milliseconds, best of `runs` (single core sandbox, python 3.13)
+BUDGETS = {
+    "incognito_anonymizer": 40,
+    "incognito_anonymizer.mask": 60,
+    "incognito_anonymizer.cli": 400,
+}
+
+# loaded only by the features that need them
+DEFERRED = ("cassis", "asyncio", "multiprocessing")
+
+
+def import_time(module: str) -> float:
+    """Cumulative import time of `module` in a fresh interpreter, in ms."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    for line in reversed(result.stderr.splitlines()):
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000
+    raise RuntimeError(f"no import time for {module}")
+
+
+def loaded(module: str) -> list:
+    """Modules of `DEFERRED` loaded by the import of `module`."""
+    code = (
+        f"import sys, {module}; "
+        f"print(' '.join(m for m in {DEFERRED!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return result.stdout.split()
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    failed = False
+    for module, budget in BUDGETS.items():
+        best = min(import_time(module) for _ in range(runs))
+        unexpected = loaded(module)
+        status = "ok" if best <= budget and not unexpected else "OVER"
+        failed |= status != "ok"
+        print(
+            f"{module:<28} {best:7.1f} ms  budget {budget:4d} ms  {status}"
+            + (f"  loads {', '.join(unexpected)}" if unexpected else "")
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
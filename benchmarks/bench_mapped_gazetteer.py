@@ -0,0 +1,72 @@
+"""
+Cold start and memory of worker processes using a gazetteer compiled with
+`Gazetteer.save` and opened with mmap, against building it in-process.
+
+Usage: python benchmarks/bench_mapped_gazetteer.py [entries] [workers]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+from incognito_anonymizer import analyzer
+from bench_gazetteer import identifiers
+from corpus import clinical_letters
+
+
+def memory():
+    """(anonymous, file backed) resident memory of the process, in MiB."""
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("RssAnon", "RssFile"):
+                values[key] = int(value.split()[0]) / 1024
+    return values.get("RssAnon", 0.0), values.get("RssFile", 0.0)
+
+
+def worker(path):
+    before = memory()
+    start = time.perf_counter()
+    gazetteer = analyzer.MappedGazetteer(path)
+    opened = time.perf_counter() - start
+    strategy = analyzer.PiiStrategy(gazetteer=gazetteer)
+    docs = clinical_letters(200, seed=os.getpid())
+    start = time.perf_counter()
+    for text in docs:
+        strategy.analyze(text, None)
+    elapsed = time.perf_counter() - start
+    after = memory()
+    return opened, len(docs) / elapsed, after[0] - before[0], after[1] - before[1]
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+    start = time.perf_counter()
+    gazetteer = analyzer.Gazetteer(identifiers(size))
+    built = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "gazetteer.bin")
+        start = time.perf_counter()
+        gazetteer.save(path)
+        saved = time.perf_counter() - start
+        del gazetteer
+        print(
+            f"{size} entries: build {built:.2f}s, save {saved:.2f}s,"
+            f" file {os.path.getsize(path) / 2**20:.1f} MiB"
+        )
+
+        with Pool(workers) as pool:
+            for opened, rate, anon, mapped in pool.map(worker, [path] * workers):
+                print(
+                    f"worker: open {opened * 1000:6.2f}ms  {rate:8.1f} docs/s"
+                    f"  +{anon:6.1f} MiB anon  +{mapped:6.1f} MiB shared file pages"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Time to mask a ~1 MB document with thousands of spans, with the former
+list splicing (one slice assignment per span, from the end) and with
+the single-pass renderer of incognito_anonymizer.mask.
+
+Usage: python benchmarks/bench_mask.py [size] [spans]
+"""
+
+import io
+import random
+import sys
+import time
+
+from incognito_anonymizer import mask
+
+
+def splice(text, coordinate):
+    text_as_list = list(text)
+    all_positions = []
+    for spans, repl in coordinate.items():
+        all_positions.extend((start, end, repl) for start, end in spans)
+    all_positions.sort(key=lambda x: x[0], reverse=True)
+    for start, end, repl in all_positions:
+        text_as_list[start:end] = list(repl)
+    return "".join(text_as_list)
+
+
+def document(size, n_spans, seed=0):
+    rng = random.Random(seed)
+    text = "".join(rng.choice("abcdefghij klmnop") for _ in range(size))
+    starts = sorted(rng.sample(range(0, size - 20, 20), n_spans))
+    coordinate = {}
+    for index, start in enumerate(starts):
+        end = start + rng.randint(3, 15)
+        label = ("<NAME>", "<EMAIL>", "<PHONE>")[index % 3]
+        coordinate.setdefault(label, []).append((start, end))
+    return text, {tuple(spans): label for label, spans in coordinate.items()}
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20
+    n_spans = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    text, coordinate = document(size, n_spans)
+    strategy = mask.PlaceholderStrategy()
+
+    start = time.perf_counter()
+    expected = splice(text, coordinate)
+    print(f"list splicing   {time.perf_counter() - start:8.3f} s")
+
+    start = time.perf_counter()
+    result = strategy.mask(text, coordinate)
+    print(f"render          {time.perf_counter() - start:8.3f} s")
+    assert result == expected
+
+    buffer = io.StringIO()
+    start = time.perf_counter()
+    strategy.mask(text, coordinate, stream=buffer)
+    print(f"render (stream) {time.perf_counter() - start:8.3f} s")
+    assert buffer.getvalue() == expected
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Docs/sec of the regex based analyzers, with raw pattern strings handed to
+`regex.finditer` (previous behaviour) and with the shared compiled table,
+and on short notes with and without the literal-trigger prefilter.
+
+Usage: python benchmarks/bench_patterns.py [n_docs]
+"""
+
+import sys
+import time
+import warnings
+
+import regex
+
+from incognito_anonymizer import analyzer
+from corpus import clinical_letters
+
+
+def scan_raw(patterns, docs):
+    for text in docs:
+        for pattern in patterns:
+            list(regex.finditer(pattern, text, overlapped=True))
+
+
+def scan_compiled(table, docs):
+    for text in docs:
+        for pattern, _ in table:
+            list(pattern.finditer(text, overlapped=True))
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {len(args[-1]) / elapsed:10.1f} docs/s")
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    docs = clinical_letters(n_docs)
+    warnings.simplefilter("ignore")
+    lossy = analyzer.LossyStrategy()
+    patterns = list(lossy.PATTERNS) + list(lossy.LOSSY_PATTERNS)
+    table = lossy.compiled_patterns + lossy.compiled_lossy_patterns
+
+    timed("raw strings (regex module cache)", scan_raw, patterns, docs)
+    timed("shared compiled table", scan_compiled, table, docs)
+    timed("RegexStrategy.analyze", lambda d: [analyzer.RegexStrategy().analyze(t) for t in d], docs)
+    timed("LossyStrategy.analyze", lambda d: [lossy.analyze(t) for t in d], docs)
+
+    # short notes, most of them without title, email or address
+    notes = [letter.split("\n")[0] for letter in clinical_letters(n_docs * 10, seed=1)]
+    for prefilter in (False, True):
+        strategy = analyzer.RegexStrategy(prefilter=prefilter)
+        timed(f"short notes prefilter={prefilter}", lambda d: [strategy.analyze(t) for t in d], notes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Docs/sec of PiiStrategy when the documents of a patient are processed
+back-to-back, with and without the keyword processor cache, and speed
+of the accent folding against the former NFD generator.
+
+Usage: python benchmarks/bench_pii.py [n_patients] [docs_per_patient]
+"""
+
+import sys
+import time
+import unicodedata
+
+from incognito_anonymizer import analyzer
+from corpus import clinical_letters, personal_infos
+
+
+def nfd_strip(text):
+    return "".join(
+        c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn"
+    )
+
+
+def bench_folding(docs, repeat=20):
+    for name, fold in (("nfd generator", nfd_strip), ("fold_accents", analyzer.fold_accents)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for text in docs:
+                fold(text)
+        elapsed = time.perf_counter() - start
+        size = repeat * sum(map(len, docs))
+        print(f"{name:<14} {size / elapsed / 1e6:8.2f} Mchars/s")
+
+
+def main():
+    n_patients = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    per_patient = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    docs = clinical_letters(per_patient)
+    patients = personal_infos(n_patients)
+    bench_folding(docs)
+
+    for cache_size in (0, 128):
+        strategy = analyzer.PiiStrategy(cache_size=cache_size)
+        start = time.perf_counter()
+        for info in patients:
+            for text in docs:
+                strategy.analyze(text, info)
+        elapsed = time.perf_counter() - start
+        print(
+            f"cache_size={cache_size:<4} {n_patients * per_patient / elapsed:10.1f} docs/s"
+            f"  {strategy.cache_info()}"
+        )
+
+
+if __name__ == "__main__":
+    main()
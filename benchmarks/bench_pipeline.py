@@ -0,0 +1,37 @@
+"""
+Docs/sec of Anonymizer.anonymize with the sequential and single_pass
+pipelines.
+
+Usage: python benchmarks/bench_pipeline.py [n_docs] [sentences]
+"""
+
+import sys
+import time
+import warnings
+
+from incognito_anonymizer import Anonymizer
+from corpus import clinical_letters, personal_infos
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sentences = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    docs = clinical_letters(n_docs, sentences=sentences)
+    infos = personal_infos(n_docs)
+    warnings.simplefilter("ignore")
+
+    for analyzers in (["regex", "pii"], ["regex", "pii", "lossy"]):
+        for pipeline in Anonymizer.PIPELINES:
+            ano = Anonymizer()
+            ano.set_pipeline(pipeline)
+            for name in analyzers:
+                ano.add_analyzer(name)
+            start = time.perf_counter()
+            for text, info in zip(docs, infos):
+                ano.anonymize(text, info)
+            elapsed = time.perf_counter() - start
+            print(f"{'+'.join(analyzers):<16} {pipeline:<12} {n_docs / elapsed:8.1f} docs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Loading of a cohort of patients from csv: one PersonalInfo per patient
+(as set_info_from_dict) with its keywords rendered by strftime, as
+PiiStrategy.keywords did, against PatientRegistry; then docs/sec of the
+pii analyzer with PersonalInfo or patient IDs, cache cold.
+
+Usage: python benchmarks/bench_registry.py [n_patients]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from incognito_anonymizer import PatientRegistry, PersonalInfo, analyzer
+from corpus import FIRST_NAMES, LAST_NAMES, clinical_letters
+
+
+def write_cohort(path, n, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ipp", "first_name", "last_name", "birthdate", "postal_code"])
+        for i in range(n):
+            birthdate = datetime(1940, 1, 1) + timedelta(days=rng.randint(0, 25000))
+            writer.writerow([
+                str(10**9 + i), rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                birthdate.strftime("%Y-%m-%d"), str(rng.randint(29000, 29999)),
+            ])
+
+
+def strftime_keywords(info):
+    """Keywords of a patient as formerly rendered by PiiStrategy.keywords."""
+    keywords = (
+        (info.first_name, "<NAME>"),
+        (info.last_name, "<NAME>"),
+        (info.birth_name, "<NAME>"),
+        (info.ipp, "<IPP>"),
+        (info.iep, "<IEP>"),
+        (info.postal_code, "<CODE_POSTAL>"),
+        (info.birthdate.strftime("%m/%d/%Y"), "<DATE>"),
+        (info.birthdate.strftime("%m %d %Y"), "<DATE>"),
+        (info.birthdate.strftime("%m:%d:%Y"), "<DATE>"),
+        (info.birthdate.strftime("%m-%d-%Y"), "<DATE>"),
+        (info.birthdate.strftime("%Y-%m-%d"), "<DATE>"),
+        (info.birthdate.strftime("%d/%m/%Y"), "<DATE>"),
+        (info.adress, "<ADRESSE>"),
+    )
+    return tuple((k, t) for k, t in keywords if k)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    path = os.path.join(tempfile.mkdtemp(), "cohort.csv")
+    write_cohort(path, n)
+
+    start = time.perf_counter()
+    with open(path, newline="", encoding="utf-8") as f:
+        infos = [PersonalInfo(**row) for row in csv.DictReader(f)]
+    keywords = [strftime_keywords(info) for info in infos]
+    elapsed = time.perf_counter() - start
+    print(f"PersonalInfo + keywords {n / elapsed / 1e3:8.1f} k patients/s")
+
+    start = time.perf_counter()
+    registry = PatientRegistry.from_csv(path)
+    elapsed = time.perf_counter() - start
+    print(f"PatientRegistry         {n / elapsed / 1e3:8.1f} k patients/s")
+    assert len(registry) == len(keywords)
+
+    docs = clinical_letters(2000, sentences=4)
+    ids = list(registry)[: len(docs)]
+    strategy = analyzer.PiiStrategy(registry=registry)
+    for name, patients in (("PersonalInfo", infos[: len(docs)]), ("patient ID", ids)):
+        strategy.invalidate()
+        start = time.perf_counter()
+        for text, patient in zip(docs, patients):
+            strategy.analyze(text, patient)
+        elapsed = time.perf_counter() - start
+        print(f"pii by {name:<16} {len(docs) / elapsed:8.1f} docs/s (one patient per doc)")
+
+
+if __name__ == "__main__":
+    main()
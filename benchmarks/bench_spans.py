@@ -0,0 +1,49 @@
+"""
+Scaling of the span bookkeeping of RegexStrategy with the number of spans.
+
+Each report repeats a line holding dates and phone numbers, the time per
+span should stay roughly constant as the report grows.
+
+Usage: python benchmarks/bench_spans.py
+"""
+
+import time
+
+from incognito_anonymizer import analyzer
+
+LINE = "Bilan du 12/03/2021, revu le 4 mars 2021, joignable au 06 12 34 56 78.\n"
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    strategy = analyzer.RegexStrategy()
+    print(f"{'lines':>6} {'spans':>6} {'analyze (ms)':>13} {'bookkeeping (ms)':>17} {'us/span':>8}")
+    for lines in (50, 100, 200, 400, 800, 1600):
+        text = LINE * lines
+        spans = strategy.analyze(text)
+        n_spans = sum(len(key) for key in spans)
+        analyze = timed(strategy.analyze, text)
+
+        # bookkeeping only: dedup, merge and conflict resolution on the raw spans
+        found = strategy._pattern_spans(
+            text, tuple(strategy.PATTERNS.items()), analyzer.AnalysisState()
+        )
+
+        def bookkeeping():
+            store = analyzer.SpanStore()
+            for _, pattern_spans, repl in found:
+                if pattern_spans:
+                    store.add(strategy._remove_overlapping_spans(pattern_spans), repl)
+            strategy._resolve_position_conflicts(store.position)
+
+        merge = timed(bookkeeping)
+        print(f"{lines:>6} {n_spans:>6} {analyze * 1e3:>13.1f} {merge * 1e3:>17.1f} {merge * 1e6 / n_spans:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Peak memory and time of anonymize_file (streaming by windows) against
+reading the whole file and calling anonymize, for growing file sizes.
+
+Usage: python benchmarks/bench_stream.py [sizes in MB...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from incognito_anonymizer import Anonymizer
+from corpus import clinical_letters, personal_infos
+
+
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    sizes = [float(a) for a in sys.argv[1:]] or [0.5, 1, 2]
+    letter = "\n".join(clinical_letters(50))
+
+    ano = Anonymizer()
+    ano.set_pipeline("single_pass")
+    ano.add_analyzer("regex")
+    ano.add_analyzer("pii")
+    ano.set_info(personal_infos(1)[0])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "in.txt")
+        streamed = os.path.join(tmp, "streamed.txt")
+        whole = os.path.join(tmp, "whole.txt")
+        for size in sizes:
+            with open(source, "w") as f:
+                for _ in range(int(size * 2**20 / len(letter)) + 1):
+                    f.write(letter + "\n")
+
+            def read_whole():
+                with open(whole, "w") as f:
+                    f.write(ano.anonymize(ano.open_text_file(source)))
+
+            stream_time, stream_peak = measure(lambda: ano.anonymize_file(source, streamed))
+            whole_time, whole_peak = measure(read_whole)
+            with open(streamed) as a, open(whole) as b:
+                identical = a.read() == b.read()
+            print(
+                f"{os.path.getsize(source) / 2**20:6.1f} MB  stream {stream_time:6.1f}s"
+                f" peak {stream_peak:7.1f} MiB  whole {whole_time:6.1f}s"
+                f" peak {whole_peak:7.1f} MiB  identical={identical}"
+            )
+
+
+if __name__ == "__main__":
+    main()
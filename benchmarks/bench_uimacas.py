@@ -0,0 +1,69 @@
+"""
+Documents/sec of the UIMA CAS export of a corpus to XMI files: a new Cas
+and type system per document with annotations added one by one (former
+UimaCasStrategy.annotate), the shared type system, and save_many in a
+pool of processes. The spans are computed beforehand.
+
+Usage: python benchmarks/bench_uimacas.py [n_docs] [workers]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+from cassis import Cas
+
+from incognito_anonymizer import Anonymizer, anotate
+from corpus import clinical_letters, personal_infos
+
+
+def per_document_typesystem(text, coordinate, type_name="custom.NamedEntity"):
+    cas = Cas()
+    cas.sofa_string = text
+    typesystem = cas.typesystem
+    if not typesystem.contains_type(type_name):
+        NamedEntityType = typesystem.create_type(type_name, supertypeName="uima.tcas.Annotation")
+        typesystem.create_feature(NamedEntityType, "label", "uima.cas.String")
+    NamedEntity = typesystem.get_type(type_name)
+    for spans_tuple, label in coordinate.items():
+        for start, end in spans_tuple:
+            cas.add(NamedEntity(begin=start, end=end, label=label))
+    return cas
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    warnings.simplefilter("ignore")
+
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    ano.add_analyzer("pii")
+    documents = [
+        (f"doc{index}", text, ano._annotation_spans(text, infos))
+        for index, (text, infos) in enumerate(zip(clinical_letters(n_docs), personal_infos(n_docs)))
+    ]
+    strategy = anotate.UimaCasStrategy()
+
+    def former(directory):
+        for name, text, coordinate in documents:
+            cas = per_document_typesystem(text, coordinate)
+            cas.to_xmi(os.path.join(directory, f"{name}.xmi"), pretty_print=True)
+
+    runs = [
+        ("per document type system", former),
+        ("shared type system", lambda directory: strategy.save_many(documents, directory, workers=1)),
+        (f"save_many {workers} processes", lambda directory: strategy.save_many(documents, directory, workers=workers)),
+    ]
+    for name, run in runs:
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            run(directory)
+            elapsed = time.perf_counter() - start
+        print(f"{name:<28} {n_docs / elapsed:8.1f} docs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Synthetic corpus of french clinical letters used by the benchmarks.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from incognito_anonymizer import PersonalInfo
+
+FIRST_NAMES = ["Jean", "Marie", "Pierre", "Anne", "Louis", "Claire", "Yann", "Nolwenn", "Erwan", "Sophie"]
+LAST_NAMES = ["DUPONT", "LE GALL", "MORVAN", "KERJEAN", "LECLERC", "ABGRALL", "TANGUY", "LE BRIS", "PRIGENT", "QUEMENER"]
+TITLES = ["Docteur", "Dr", "Monsieur", "Madame", "Professeur", "Interne :", "Mme"]
+MONTHS = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août", "septembre", "octobre", "novembre", "décembre"]
+STREETS = ["rue de Siam", "avenue Foch", "boulevard de Plymouth", "impasse des Lilas", "allée Verte"]
+CITIES = ["BREST", "QUIMPER", "MORLAIX", "LANDERNEAU"]
+
+SENTENCES = [
+    "Je revois en consultation {title} {last} {first} pour le suivi de sa pathologie.",
+    "Le patient a été hospitalisé du {day} au {date_lit} dans le service de cardiologie.",
+    "Antécédents : hypertension artérielle, diabète de type 2 traité par metformine.",
+    "Examen clinique sans particularité, auscultation cardio-pulmonaire normale.",
+    "Bilan biologique du {date_num} : hémoglobine 12,4 g/dL, créatinine 78 µmol/L.",
+    "Je vous remercie de l'avoir adressé, {title} {first} {last}.",
+    "Le traitement est poursuivi à l'identique jusqu'en {month} {year}.",
+    "Vous pouvez me joindre au {phone} ou par mail à {email}.",
+    "Adresse : {number} {street}, {zip} {city}",
+    "Pas de modification thérapeutique, prochain rendez-vous dans six mois.",
+    "Échographie abdominale réalisée le {date_num}, sans anomalie notable.",
+]
+
+
+def _fill(rng: random.Random, sentence: str) -> str:
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    return sentence.format(
+        title=rng.choice(TITLES),
+        first=first,
+        last=last,
+        day=rng.randint(1, 28),
+        month=rng.choice(MONTHS),
+        year=rng.randint(1990, 2025),
+        date_lit=f"{rng.randint(1, 28)} {rng.choice(MONTHS)} {rng.randint(1990, 2025)}",
+        date_num=f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1990, 2025)}",
+        phone="06 " + " ".join(f"{rng.randint(0, 99):02d}" for _ in range(4)),
+        email=f"{first.lower()}.{last.lower().replace(' ', '')}@chu-brest.fr",
+        number=rng.randint(1, 200),
+        street=rng.choice(STREETS),
+        zip=rng.randint(29000, 29999),
+        city=rng.choice(CITIES),
+    )
+
+
+def clinical_letters(n: int, sentences: int = 12, seed: int = 0) -> list:
+    """
+    Build `n` pseudo clinical letters of `sentences` sentences each.
+
+    :param n: number of letters
+    :param sentences: number of sentences per letter
+    :param seed: random seed, the corpus is deterministic for a given seed
+    :returns: list of letters
+    """
+    rng = random.Random(seed)
+    return [
+        "\n".join(_fill(rng, rng.choice(SENTENCES)) for _ in range(sentences))
+        for _ in range(n)
+    ]
+
+
+def personal_infos(n: int, seed: int = 0) -> list:
+    """
+    Build `n` random PersonalInfo records.
+
+    :param n: number of patients
+    :param seed: random seed
+    :returns: list of PersonalInfo
+    """
+    rng = random.Random(seed)
+    return [
+        PersonalInfo(
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            birthdate=datetime(1940, 1, 1) + timedelta(days=rng.randint(0, 25000)),
+            ipp=str(rng.randint(10**9, 10**10 - 1)),
+            postal_code=str(rng.randint(29000, 29999)),
+        )
+        for _ in range(n)
+    ]
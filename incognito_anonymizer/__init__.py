@@ -1,2 +1,38 @@
-from .analyzer import PersonalInfo
-from .anonymizer import Anonymizer, DetectedEntity
+"""
+Anonymization of french texts.
+
+The public names are imported on first access, so that importing a
+submodule (e.g. `incognito_anonymizer.mask`) doesn't load the others.
+"""
+
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .analyzer import Gazetteer, MappedGazetteer, PatientRegistry, PersonalInfo
+    from .anonymizer import Anonymizer, DetectedEntity, EntityTable
+
+_EXPORTS = {
+    "Gazetteer": "analyzer",
+    "MappedGazetteer": "analyzer",
+    "PatientRegistry": "analyzer",
+    "PersonalInfo": "analyzer",
+    "Anonymizer": "anonymizer",
+    "DetectedEntity": "anonymizer",
+    "EntityTable": "anonymizer",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,6 +1,20 @@
+import csv
+import hashlib
+import json
+import mmap
+import string
+import struct
+import sys
+import threading
+import time
 import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, Iterable, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple, Union
 
 import regex
 import re
@@ -20,18 +34,750 @@ class PersonalInfo(BaseModel):
     adress: Optional[str] = ""
 
 
+@lru_cache(maxsize=None)
+def compile_pattern_table(
+    patterns: Tuple[Tuple[str, str], ...],
+) -> Tuple[Tuple[regex.Pattern, str], ...]:
+    """
+    Compile a pattern table once per process.
+
+    The result is cached on the table content, so every strategy instance
+    built with the same patterns shares the same compiled objects instead of
+    going through the small internal cache of the `regex` module.
+
+    :param patterns: tuple of (pattern, replacement)
+    :returns: immutable tuple of (compiled pattern, replacement)
+    """
+    return tuple((regex.compile(pattern), repl) for pattern, repl in patterns)
+
+
+@dataclass
+class PatternTimeout:
+    """A pattern that exceeded its time budget on a document."""
+
+    pattern: str
+    replacement: str
+    document: str
+
+
+@dataclass
+class AnalysisState:
+    """
+    Results of one `RegexStrategy.analyze` call, so that calls running in
+    different threads don't share them.
+    """
+
+    position: Dict[Tuple[Tuple[int, int]], str] = field(default_factory=dict)
+    skipped_families: set = field(default_factory=set)
+    timeouts: list = field(default_factory=list)
+
+
+class SpanStore:
+    """
+    Position dict built pattern by pattern.
+
+    Every span is indexed to the key holding it, so adding the spans of a
+    pattern only looks up these spans instead of scanning every existing key.
+    """
+
+    def __init__(self):
+        self.position: Dict[Tuple[Tuple[int, int]], str] = {}
+        self._keys: Dict[Tuple[int, int], Tuple[Tuple[int, int]]] = {}
+
+    def add(self, spans: list, repl: str):
+        """
+        Add the spans of one pattern, merging them with the keys that already
+        contain one of these spans.
+
+        :param spans: spans found by the pattern
+        :param repl: replacement of the pattern
+        """
+        overlapping_keys = {self._keys[span] for span in spans if span in self._keys}
+
+        if overlapping_keys:
+            key = tuple(
+                sorted(
+                    set(span for key in overlapping_keys for span in key).union(spans)
+                )
+            )
+            for overlapping_key in overlapping_keys:
+                del self.position[overlapping_key]
+        else:
+            key = tuple(spans)
+        self.position[key] = repl
+        for span in key:
+            self._keys[span] = key
+
+
+class PatternProfiler:
+    """
+    Cumulative counters per pattern (or keyword set) of a strategy: wall
+    time, calls, matches and matches kept in the final positions.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _entry(self, key: str, label: str) -> dict:
+        entry = self.stats.get(key)
+        if entry is None:
+            entry = self.stats[key] = {
+                "label": label,
+                "calls": 0,
+                "time": 0.0,
+                "matches": 0,
+                "kept": 0,
+            }
+        return entry
+
+    def record(self, key: str, label: str, elapsed: float, matches: int):
+        """Count one run of a pattern."""
+        with self._lock:
+            entry = self._entry(key, label)
+            entry["calls"] += 1
+            entry["time"] += elapsed
+            entry["matches"] += matches
+
+    def record_kept(self, key: str, label: str, kept: int):
+        """Count the matches of a pattern kept in the final positions."""
+        with self._lock:
+            self._entry(key, label)["kept"] += kept
+
+    def as_dict(self) -> Dict[str, dict]:
+        """
+        :returns: dict {pattern: {"label", "calls", "time", "matches", "kept"}}
+        """
+        with self._lock:
+            return {key: dict(entry) for key, entry in self.stats.items()}
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        """
+        Dump the counters as JSON.
+
+        :param path: optional file to write the JSON to
+        :returns: JSON string
+        """
+        data = json.dumps(self.as_dict(), ensure_ascii=False, indent=2)
+        if path:
+            with open(path, "w") as f:
+                f.write(data)
+        return data
+
+    def reset(self):
+        """Clear the counters."""
+        with self._lock:
+            self.stats = {}
+
+
 class AnalyzerStrategy:
     """Constructeur de la Class Strategy"""
 
+    profiler: Optional[PatternProfiler] = None
+
     def analyze(text: str, info: PersonalInfo = None):
         raise NotImplementedError()
 
+    def enable_profiling(self) -> PatternProfiler:
+        """
+        Start recording per pattern counters, readable with
+        `profiler.as_dict()` or `profiler.to_json()`.
 
-class PiiStrategy(AnalyzerStrategy):
-    """Detect personal infos"""
+        :returns: the profiler of the strategy
+        """
+        if self.profiler is None:
+            self.profiler = PatternProfiler()
+        return self.profiler
+
+    def disable_profiling(self):
+        """Stop recording counters."""
+        self.profiler = None
+
+
+class _FoldTable(dict):
+    """
+    Accent-free form of each code point, filled lazily: a code point is
+    decomposed (NFD) and stripped of its combining marks the first time
+    it is seen.
+
+    Code points whose folded form is not exactly one character (combining
+    marks, Hangul syllables...) are kept in `irregular`, the texts
+    containing one of them need an offset map.
+    """
 
     def __init__(self):
-        pass
+        super().__init__()
+        self.irregular = set()
+
+    def __missing__(self, char: str) -> str:
+        folded = "".join(
+            c
+            for c in unicodedata.normalize("NFD", char)
+            if unicodedata.category(c) != "Mn"
+        )
+        if len(folded) != 1:
+            self.irregular.add(char)
+        self[char] = folded
+        return folded
+
+
+_FOLD_TABLE = _FoldTable()
+_NON_ASCII = re.compile(r"[^\x00-\x7f]+")
+
+
+def fold_accents(text: str) -> Tuple[str, Optional[array]]:
+    """
+    Remove the accents of a text, keeping track of the original offsets.
+
+    :param text: text to fold
+    :returns: tuple (folded text, offsets) where offsets[i] is the position
+        in `text` of the i-th folded character, with len(text) appended.
+        offsets is None when the positions are unchanged, which is the
+        case for ascii and precomposed (NFC) texts.
+    """
+    if text.isascii():
+        return text, None
+    # un texte n'a que quelques caractères non ascii distincts, les
+    # remplacer un par un reste en C
+    chars = set("".join(_NON_ASCII.findall(text)))
+    folded = text
+    for char in chars:
+        replacement = _FOLD_TABLE[char]
+        if replacement != char:
+            folded = folded.replace(char, replacement)
+    if chars.isdisjoint(_FOLD_TABLE.irregular):
+        return folded, None
+
+    offsets = array("l")
+    for i, char in enumerate(text):
+        offsets.extend([i] * len(_FOLD_TABLE[char]))
+    offsets.append(len(text))
+    return folded, offsets
+
+
+class Gazetteer:
+    """
+    Identifiers shared by every document (relatives, other patients,
+    staff...), matched by `PiiStrategy` along with the patient keywords.
+
+    The words are accent-stripped and stored in one keyword trie, built
+    once, whose lookup cost depends on the text and not on the number of
+    words.
+
+    :param entries: Iterable of tuples (word, replacement).
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str]] = ()):
+        self.processor = KeywordProcessor(case_sensitive=False)
+        self.update(entries)
+
+    def add(self, word: str, replacement: str = "<NAME>"):
+        """
+        Add a word to the gazetteer.
+
+        :param word: word to hide, ignored if empty
+        :param replacement: placeholder of the word
+        """
+        if word:
+            self.processor.add_keyword(fold_accents(word)[0], replacement)
+
+    def update(self, entries: Iterable[Tuple[str, str]]):
+        """
+        :param entries: Iterable of tuples (word, replacement).
+        """
+        for word, replacement in entries:
+            self.add(word, replacement)
+
+    @classmethod
+    def from_csv(
+        cls, path: str, replacement: str = "<NAME>", delimiter: str = ","
+    ) -> "Gazetteer":
+        """
+        Load a gazetteer from a csv file with one word per row, followed
+        by its replacement.
+
+        :param path: path of the csv file
+        :param replacement: replacement of the rows with a single column
+        :param delimiter: csv delimiter
+        :returns: Gazetteer
+        """
+        gazetteer = cls()
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f, delimiter=delimiter):
+                if row:
+                    gazetteer.add(row[0].strip(), row[1].strip() if len(row) > 1 else replacement)
+        return gazetteer
+
+    def __len__(self) -> int:
+        return len(self.processor)
+
+    def __contains__(self, word: str) -> bool:
+        return fold_accents(word)[0] in self.processor
+
+    def extract_keywords(self, sentence: str, span_info: bool = False) -> list:
+        """Same as `KeywordProcessor.extract_keywords` on the gazetteer words."""
+        return self.processor.extract_keywords(sentence, span_info=span_info)
+
+    def save(self, path: str):
+        """
+        Compile the gazetteer to a file opened by `MappedGazetteer`.
+
+        The trie is written as flat arrays : for each node, its first edge,
+        its number of edges and its replacement (0 for none, else index + 1)
+        then the characters of the edges, sorted per node, and their child
+        node, then the replacements as json.
+
+        :param path: path of the compiled gazetteer
+        """
+        trie = self.processor.keyword_trie_dict
+        keyword = self.processor._keyword
+        nodes = array("I")
+        chars = array("I")
+        children = array("I")
+        replacements = {}
+
+        # parcours en largeur : les arêtes d'un noeud sont contiguës
+        queue = [trie]
+        for node in queue:
+            edges = sorted((c, child) for c, child in node.items() if c != keyword)
+            nodes.extend((len(chars), len(edges), 0))
+            if keyword in node:
+                replacement = node[keyword]
+                nodes[-1] = replacements.setdefault(replacement, len(replacements)) + 1
+            for c, child in edges:
+                chars.append(ord(c))
+                children.append(len(queue))
+                queue.append(child)
+
+        labels = json.dumps(list(replacements)).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(
+                MappedGazetteer.HEADER.pack(
+                    MappedGazetteer.MAGIC, len(self), len(queue), len(chars), len(labels)
+                )
+            )
+            for values in (nodes, chars, children):
+                if sys.byteorder != "little":
+                    values.byteswap()
+                values.tofile(f)
+            f.write(labels)
+
+
+class MappedGazetteer:
+    """
+    Gazetteer compiled by `Gazetteer.save`, opened with mmap : opening is
+    immediate whatever its size and the processes opening the same file
+    share its pages.
+
+    Matches the longest word starting and ending on a word boundary, like
+    `Gazetteer`.
+
+    :param path: path of the compiled gazetteer
+    """
+
+    MAGIC = b"INCOGAZ1"
+    # magic, words, nodes, edges, size of the replacements
+    HEADER = struct.Struct("<8sQQQQ")
+    WORD_CHARACTERS = frozenset(string.digits + string.ascii_letters + "_")
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.words, n_nodes, n_edges, labels_size = self.HEADER.unpack_from(self._mmap)
+        if magic != self.MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a compiled gazetteer")
+        if sys.byteorder != "little":
+            self._mmap.close()
+            raise ValueError("compiled gazetteers are only readable on little endian platforms")
+
+        view = memoryview(self._mmap)
+        offset = self.HEADER.size
+        self._nodes = view[offset : offset + 12 * n_nodes].cast("I")
+        offset += 12 * n_nodes
+        self._chars = view[offset : offset + 4 * n_edges].cast("I")
+        offset += 4 * n_edges
+        self._children = view[offset : offset + 4 * n_edges].cast("I")
+        offset += 4 * n_edges
+        self.replacements = [None] + json.loads(bytes(view[offset : offset + labels_size]))
+        # la racine est visitée à chaque début de mot
+        self._root = {
+            chr(self._chars[edge]): self._children[edge]
+            for edge in range(self._nodes[0], self._nodes[0] + self._nodes[1])
+        }
+        # débuts de mot dont le premier caractère est dans le trie
+        self._starts = re.compile(
+            "(?<![0-9A-Za-z_])[" + "".join(re.escape(c) for c in self._root) + "]"
+            if self._root
+            else "(?!)"
+        )
+
+    @classmethod
+    def is_compiled(cls, path: str) -> bool:
+        """
+        :param path: path of a file
+        :returns: True if the file was written by `Gazetteer.save`
+        """
+        with open(path, "rb") as f:
+            return f.read(len(cls.MAGIC)) == cls.MAGIC
+
+    def close(self):
+        """Release the mapping."""
+        for view in (self._nodes, self._chars, self._children):
+            view.release()
+        self._mmap.close()
+
+    def __reduce__(self):
+        # les processus fils ouvrent à nouveau le fichier et partagent ses pages
+        return type(self), (self.path,)
+
+    def __enter__(self) -> "MappedGazetteer":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.words
+
+    def _walk(self, text: str, start: int) -> Tuple[int, int]:
+        """
+        Longest word of the trie at `start`.
+
+        :returns: (replacement index, end), replacement index is 0 if no word
+        """
+        node = self._root.get(text[start]) if start < len(text) else None
+        if node is None:
+            return 0, start
+
+        nodes, chars, children = self._nodes, self._chars, self._children
+        word_characters = self.WORD_CHARACTERS
+        size = len(text)
+        end = start + 1
+        found = (0, start)
+        while True:
+            replacement = nodes[3 * node + 2]
+            if replacement and (end == size or text[end] not in word_characters):
+                found = (replacement, end)
+            if end == size:
+                return found
+            first = nodes[3 * node]
+            last = first + nodes[3 * node + 1]
+            code = ord(text[end])
+            edge = bisect_left(chars, code, first, last)
+            if edge == last or chars[edge] != code:
+                return found
+            node = children[edge]
+            end += 1
+
+    def __contains__(self, word: str) -> bool:
+        word = fold_accents(word)[0].lower()
+        return self._walk(word, 0)[1] == len(word) > 0
+
+    def extract_keywords(self, sentence: str, span_info: bool = False) -> list:
+        """Same as `KeywordProcessor.extract_keywords` on the gazetteer words."""
+        text = sentence.lower()
+        found = []
+        position = 0
+        walk = self._walk
+        for start in self._starts.finditer(text):
+            start = start.start()
+            if start < position:
+                continue
+            replacement, end = walk(text, start)
+            if replacement:
+                found.append((self.replacements[replacement], start, end))
+                position = end
+        if span_info:
+            return found
+        return [replacement for replacement, _, _ in found]
+
+
+def patient_keywords(
+    first_name: str,
+    last_name: str,
+    birth_name: str,
+    birthdate: datetime,
+    ipp: str,
+    iep: str,
+    postal_code: str,
+    adress: str,
+) -> Tuple[Tuple[str, str], ...]:
+    """
+    Keywords to hide for a patient, the date variants are rendered here.
+
+    :returns: tuple of (word, replacement), empty words removed
+    """
+    day, month, year = f"{birthdate.day:02d}", f"{birthdate.month:02d}", str(birthdate.year)
+    keywords = [
+        (first_name, "<NAME>"),
+        (last_name, "<NAME>"),
+        (birth_name, "<NAME>"),
+        (ipp, "<IPP>"),
+        (iep, "<IEP>"),
+        (postal_code, "<CODE_POSTAL>"),
+        (f"{month}/{day}/{year}", "<DATE>"),
+        (f"{month} {day} {year}", "<DATE>"),
+        (f"{month}:{day}:{year}", "<DATE>"),
+        (f"{month}-{day}-{year}", "<DATE>"),
+        (f"{year}-{month}-{day}", "<DATE>"),
+        (f"{day}/{month}/{year}", "<DATE>"),
+        (adress, "<ADRESSE>"),
+    ]
+    return tuple([keyword for keyword in keywords if keyword[0]])
+
+
+def _registry_string(value, default: str, name: str, number: int) -> str:
+    """Value of a text field of a registry record."""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return str(value)
+    raise ValueError(f"record {number}: {name} must be a string")
+
+
+def _registry_birthdate(value, number: int) -> datetime:
+    """Birthdate of a registry record."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    raise ValueError(f"record {number}: invalid birthdate {value!r}")
+
+
+class PatientRegistry:
+    """
+    Personal infos of a cohort, checked in one pass and kept by columns,
+    without a PersonalInfo model per patient. The keywords of each patient
+    are computed once, accents folded, and served to `PiiStrategy` by
+    patient ID.
+
+    :param records: iterable of dicts of PersonalInfo fields
+    :param id_field: field identifying a patient
+    """
+
+    FIELDS = tuple(PersonalInfo.model_fields)
+
+    def __init__(self, records: Iterable[dict] = (), id_field: str = "ipp"):
+        if id_field not in self.FIELDS:
+            raise Exception(f"{id_field} field doesn't exist")
+        self.id_field = id_field
+        self.columns: Dict[str, list] = {
+            name: [] for name in self.FIELDS if name != "birthdate"
+        }
+        # jours depuis le 1er janvier de l'an 1
+        self.birthdates = array("l")
+        self._rows: Dict[str, int] = {}
+        self._keywords: list = []
+        self.extend(records)
+
+    def extend(self, records: Iterable[dict], start: int = 1):
+        """
+        Add patients, a patient already in the registry is replaced.
+
+        The records are checked field by field over the whole batch, the
+        record in error is only looked for when a check fails.
+
+        :param records: iterable of dicts of PersonalInfo fields
+        :param start: number of the first record in error messages
+        :raises ValueError: unknown field, missing ID or invalid birthdate
+        """
+        records = list(records)
+        if not records:
+            return
+        unknown = set().union(*(record.keys() for record in records)) - set(self.FIELDS)
+        if unknown:
+            number = next(n for n, r in enumerate(records, start) if r.keys() & unknown)
+            raise ValueError(f"record {number}: unknown fields {sorted(unknown)}")
+
+        defaults = {name: field.default for name, field in PersonalInfo.model_fields.items()}
+        values = {}
+        for name in self.columns:
+            default = defaults[name] or ""
+            column = [record.get(name, default) for record in records]
+            if not all(type(value) is str for value in column):
+                column = [
+                    _registry_string(value, default, name, number)
+                    for number, value in enumerate(column, start)
+                ]
+            values[name] = column
+        ids = values[self.id_field]
+        if not all(ids):
+            number = ids.index("") + start
+            raise ValueError(f"record {number}: empty {self.id_field}")
+
+        default_birthdate = defaults["birthdate"]
+        birthdates = [record.get("birthdate") or default_birthdate for record in records]
+        try:
+            birthdates = [
+                datetime.fromisoformat(value) if type(value) is str else value
+                for value in birthdates
+            ]
+        except ValueError:
+            birthdates = [
+                _registry_birthdate(value, number) for number, value in enumerate(birthdates, start)
+            ]
+        if not all(isinstance(value, datetime) for value in birthdates):
+            birthdates = [
+                _registry_birthdate(value, number) for number, value in enumerate(birthdates, start)
+            ]
+
+        # seuls les noms et adresses peuvent avoir des accents
+        folded = {
+            name: [value if value.isascii() else fold_accents(value)[0] for value in values[name]]
+            for name in ("first_name", "last_name", "birth_name", "adress")
+        }
+        keywords = list(map(
+            patient_keywords,
+            folded["first_name"], folded["last_name"], folded["birth_name"], birthdates,
+            values["ipp"], values["iep"], values["postal_code"], folded["adress"],
+        ))
+        ordinals = [birthdate.toordinal() for birthdate in birthdates]
+
+        rows = self._rows
+        if len(set(ids)) == len(ids) and rows.keys().isdisjoint(ids):
+            # que des nouveaux patients : ajout par colonnes
+            rows.update(zip(ids, range(len(self._keywords), len(self._keywords) + len(ids))))
+            for name, column in self.columns.items():
+                column.extend(values[name])
+            self.birthdates.extend(ordinals)
+            self._keywords.extend(keywords)
+            return
+        for index, patient_id in enumerate(ids):
+            row = rows.get(patient_id)
+            if row is None:
+                rows[patient_id] = row = len(self._keywords)
+                for name, column in self.columns.items():
+                    column.append(values[name][index])
+                self.birthdates.append(ordinals[index])
+                self._keywords.append(keywords[index])
+            else:
+                for name, column in self.columns.items():
+                    column[row] = values[name][index]
+                self.birthdates[row] = ordinals[index]
+                self._keywords[row] = keywords[index]
+
+    @classmethod
+    def from_csv(cls, path: str, id_field: str = "ipp", delimiter: str = ",") -> "PatientRegistry":
+        """
+        Load a registry from a csv file with a header of PersonalInfo fields.
+
+        :param path: path of the csv file
+        :param id_field: field identifying a patient
+        :param delimiter: csv delimiter
+        :returns: PatientRegistry
+        """
+        with open(path, newline="", encoding="utf-8") as f:
+            # ligne 1 : l'en-tête
+            return cls(csv.DictReader(f, delimiter=delimiter), id_field=id_field)
+
+    @classmethod
+    def from_jsonl(cls, path: str, id_field: str = "ipp") -> "PatientRegistry":
+        """
+        Load a registry from a JSON Lines file, one patient object per line.
+
+        :param path: path of the jsonl file
+        :param id_field: field identifying a patient
+        :returns: PatientRegistry
+        """
+        with open(path, encoding="utf-8") as f:
+            return cls((json.loads(line) for line in f if line.strip()), id_field=id_field)
+
+    def __len__(self) -> int:
+        return len(self._keywords)
+
+    def __contains__(self, patient_id: str) -> bool:
+        return patient_id in self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def _row(self, patient_id: str) -> int:
+        row = self._rows.get(patient_id)
+        if row is None:
+            raise Exception(f"{patient_id} patient doesn't exist")
+        return row
+
+    def keywords(self, patient_id: str) -> Tuple[Tuple[str, str], ...]:
+        """
+        Keywords to hide for a patient, accents folded.
+
+        :param patient_id: value of `id_field`
+        :returns: tuple of (word, replacement)
+        """
+        return self._keywords[self._row(patient_id)]
+
+    def __getitem__(self, patient_id: str) -> PersonalInfo:
+        """PersonalInfo of a patient, built without validation."""
+        row = self._row(patient_id)
+        values = {name: column[row] for name, column in self.columns.items()}
+        return PersonalInfo.model_construct(
+            birthdate=datetime.fromordinal(self.birthdates[row]), **values
+        )
+
+
+class PiiStrategy(AnalyzerStrategy):
+    """
+    Detect personal infos
+
+    :param cache_size: number of keyword processors kept, one per
+        PersonalInfo, so the documents of a same patient reuse it
+    :param gazetteer: Gazetteer or MappedGazetteer searched in every
+        document, with or without PersonalInfo
+    :param registry: PatientRegistry, `analyze` then also accepts the ID
+        of a patient of the registry instead of a PersonalInfo
+    """
+
+    def __init__(
+        self,
+        cache_size: int = 128,
+        gazetteer: Union[Gazetteer, MappedGazetteer] = None,
+        registry: PatientRegistry = None,
+    ):
+        self.cache_size = cache_size
+        self.gazetteer = gazetteer
+        self.registry = registry
+        self._processors: "OrderedDict[tuple, KeywordProcessor]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def build_processor(self, keywords: Iterable[Tuple[str, str]]) -> KeywordProcessor:
+        """
+        Build the keyword processor used by `hide_by_keywords`.
+
+        :param keywords: Iterable of tuples (word, replacement).
+        :returns: KeywordProcessor with accent-stripped keywords
+        """
+        processor = KeywordProcessor(case_sensitive=False)
+        for key, masks in keywords:
+            key, _ = fold_accents(key)
+            processor.add_keyword(key, masks)
+        return processor
 
     def hide_by_keywords(
         self, text: str, keywords: Iterable[Tuple[str, str]]
@@ -47,29 +793,31 @@ class PiiStrategy(AnalyzerStrategy):
                 - A tuple with the start and end positions of the word.
                 - The replacement string.
         """
-        processor = KeywordProcessor(case_sensitive=False)
-        for key, masks in keywords:
-            key = "".join(
-                (
-                    c
-                    for c in unicodedata.normalize("NFD", key)
-                    if unicodedata.category(c) != "Mn"
-                )
-            )
-            processor.add_keyword(key, masks)
+        return self._extract(text, self.build_processor(keywords))
 
-        normalized_text = "".join(
-            (
-                c
-                for c in unicodedata.normalize("NFD", text)
-                if unicodedata.category(c) != "Mn"
-            )
-        )
+    def _extract(
+        self, text: str, *processors: KeywordProcessor
+    ) -> Dict[Tuple[int, int], str]:
+        """
+        Run keyword processors on the accent-stripped text, positions are
+        mapped back to `text`. When several processors match overlapping
+        words, the longest one is kept, the first processor wins ties.
+        """
+        normalized_text, offsets = fold_accents(text)
         # Extract keywords with positions
-        found_keywords = processor.extract_keywords(normalized_text, span_info=True)
+        found_keywords = []
+        for processor in processors:
+            found_keywords.extend(
+                processor.extract_keywords(normalized_text, span_info=True)
+            )
+        if len(processors) > 1:
+            found_keywords = self._longest_keywords(found_keywords)
 
         result = {}
         for replacement, start, end in found_keywords:
+            if offsets is not None:
+                # the trailing combining marks belong to the word
+                start, end = offsets[start], offsets[end]
             # Wrap positions as a tuple of tuples
             key = ((start, end),)
             # if key in result:
@@ -78,40 +826,162 @@ class PiiStrategy(AnalyzerStrategy):
             result[key] = replacement
         return result
 
-    def analyze(self, text: str, info: PersonalInfo = None) -> str:
+    @staticmethod
+    def _longest_keywords(found: list) -> list:
+        """
+        Keep the longest of overlapping (replacement, start, end) matches.
+        """
+        kept = []
+        index = []
+        for found_keyword in sorted(found, key=lambda k: k[1] - k[2]):
+            _, start, end = found_keyword
+            before = bisect_left(index, (end,))
+            if before and index[before - 1][1] > start:
+                continue
+            insort(index, (start, end))
+            kept.append(found_keyword)
+        return sorted(kept, key=lambda k: k[1])
+
+    @staticmethod
+    def keywords(info: PersonalInfo) -> Tuple[Tuple[str, str], ...]:
+        """
+        Keywords to hide for a patient.
+
+        :param info: PersonalInfo
+        :returns: tuple of (word, replacement), empty words removed
+        """
+        return patient_keywords(
+            info.first_name,
+            info.last_name,
+            info.birth_name,
+            info.birthdate,
+            info.ipp,
+            info.iep,
+            info.postal_code,
+            info.adress,
+        )
+
+    @staticmethod
+    def _info_key(info: PersonalInfo) -> tuple:
+        """Cache key of a PersonalInfo: the values of all its fields."""
+        return tuple(getattr(info, field) for field in type(info).model_fields)
+
+    def _processor_key(self, info: Union[PersonalInfo, str]) -> tuple:
+        """Cache key of a patient: its PersonalInfo fields, or its keywords in the registry."""
+        if isinstance(info, str):
+            if self.registry is None:
+                raise Exception(f"{info} patient doesn't exist, no registry is set")
+            return self.registry.keywords(info)
+        return self._info_key(info)
+
+    def get_processor(self, info: Union[PersonalInfo, str]) -> KeywordProcessor:
+        """
+        Keyword processor of a patient, from the LRU cache when possible.
+
+        :param info: PersonalInfo, or ID of a patient of the registry
+        :returns: KeywordProcessor
+        """
+        key = self._processor_key(info)
+        with self._lock:
+            processor = self._processors.get(key)
+            if processor is not None:
+                self.cache_hits += 1
+                self._processors.move_to_end(key)
+                return processor
+            self.cache_misses += 1
+
+        # construit hors du verrou, deux threads peuvent construire le même
+        # les mots-clés du registre sont la clé du cache
+        processor = self.build_processor(key if isinstance(info, str) else self.keywords(info))
+        if self.cache_size > 0:
+            with self._lock:
+                self._processors[key] = processor
+                if len(self._processors) > self.cache_size:
+                    self._processors.popitem(last=False)
+        return processor
+
+    def invalidate(self, info: Union[PersonalInfo, str] = None):
+        """
+        Drop the cached processor of a patient, or of every patient.
+
+        :param info: PersonalInfo or patient ID to forget, None to clear
+            the cache
+        """
+        key = None if info is None else self._processor_key(info)
+        with self._lock:
+            if key is None:
+                self._processors.clear()
+            else:
+                self._processors.pop(key, None)
+
+    def cache_info(self) -> Dict[str, int]:
+        """
+        :returns: dict with the cache hits, misses, size and maxsize
+        """
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": len(self._processors),
+            "maxsize": self.cache_size,
+        }
+
+    def analyze(self, text: str, info: Union[PersonalInfo, str] = None) -> str:
         """
         Hide specific words based on keywords
 
         :param text: text to anonymize
+        :param info: PersonalInfo, or ID of a patient of the registry, may
+            be None when a gazetteer is set
         """
-        keywords: tuple
-        if not isinstance(info, PersonalInfo):
+        processors = []
+        if isinstance(info, PersonalInfo) or (isinstance(info, str) and self.registry is not None):
+            processors.append(self.get_processor(info))
+        elif info is not None or self.gazetteer is None:
             print("info must be a Personnal info type. Returning empty dict instead.")
             return {}
-        keywords = (
-            (info.first_name, "<NAME>"),
-            (info.last_name, "<NAME>"),
-            (info.birth_name, "<NAME>"),
-            (info.ipp, "<IPP>"),
-            (info.iep, "<IEP>"),
-            (info.postal_code, "<CODE_POSTAL>"),
-            (info.birthdate.strftime("%m/%d/%Y"), "<DATE>"),
-            (info.birthdate.strftime("%m %d %Y"), "<DATE>"),
-            (info.birthdate.strftime("%m:%d:%Y"), "<DATE>"),
-            (info.birthdate.strftime("%m-%d-%Y"), "<DATE>"),
-            (info.birthdate.strftime("%Y-%m-%d"), "<DATE>"),
-            (info.birthdate.strftime("%d/%m/%Y"), "<DATE>"),
-            (info.adress, "<ADRESSE>"),
-        )
+        if self.gazetteer is not None:
+            processors.append(self.gazetteer)
 
-        return self.hide_by_keywords(text, [(k, t) for k, t in keywords if k])
+        if self.profiler is None:
+            return self._extract(text, *processors)
+
+        started = time.perf_counter()
+        result = self._extract(text, *processors)
+        self.profiler.record("keywords", "PersonalInfo", time.perf_counter() - started, len(result))
+        self.profiler.record_kept("keywords", "PersonalInfo", len(result))
+        return result
 
 
 class RegexStrategy(AnalyzerStrategy):
-    """Detect word based on regex"""
+    """
+    Detect word based on regex
+
+    :param prefilter: skip the pattern families of `FAMILIES` whose trigger
+        doesn't occur in the text. The skipped families of a call are kept
+        in its `AnalysisState`.
+    :param pattern_timeout: time budget of one pattern on one document, in
+        seconds
+    :param document_timeout: time budget of the whole table on one document,
+        in seconds. A pattern over budget is replaced by the cheaper
+        detector of its label in `FALLBACK_PATTERNS` and reported in the
+        `timeouts` of the `AnalysisState`.
+
+    A strategy can be shared by several threads: the results of a call are
+    kept in its own `AnalysisState`, `position`, `skipped_families` and
+    `timeouts` read the state of the last call that finished.
+    """
 
-    def __init__(self):
+    def __init__(
+        self,
+        prefilter: bool = True,
+        pattern_timeout: Optional[float] = None,
+        document_timeout: Optional[float] = None,
+    ):
         super().__init__()
+        self.prefilter = prefilter
+        self.pattern_timeout = pattern_timeout
+        self.document_timeout = document_timeout
+        self.last_state = AnalysisState()
         Xxxxx = r"[A-ZÀ-Ÿ]\p{Ll}+"
         XXxX_ = r"[A-ZÀ-Ÿ][A-ZÀ-Ÿ\p{Ll}-]"
         XXxX_apostrophe = r"[A-ZÀ-Ÿ][A-ZÀ-Ÿ\p{Ll}-]*(?:[''][A-ZÀ-Ÿ][A-ZÀ-Ÿ\p{Ll}-]*)?"
@@ -181,71 +1051,204 @@ class RegexStrategy(AnalyzerStrategy):
             # r"[A-Z-ÉÈÀÂÊÎÔÛËÏÜÙÇ]{4,}\s+[A-Z-ÉÈÀÂÊÎÔÛËÏÜÙÇ][a-z-éèçùàâêîôûëïü]{4,}\s": "<NAME>",
         }
 
+        # Familles de patterns et leur déclencheur : un pattern de la famille
+        # ne peut matcher que si le déclencheur est présent dans le texte
+        street = r"rue|avenue|av|boulevard|bd|bld|impasse|allée|allee|chemin|route|square|résidence|residence|hameau|lieu[- ]dit|voie|passage|villa|domaine|lotissement|parc|traverse|ruelle|sentier|cours|quai|esplanade|quartier|promenade|rond[- ]point"
+        self.FAMILIES = {
+            "name": (
+                rf"{self.title_regex}[ \n]",
+                tuple(p for p in self.PATTERNS if p.startswith("(?P<TITLE>")),
+            ),
+            "date_litteral": (
+                rf"\b{mois}",
+                (self.date_litteral_full, self.date_litteral_partial, self.mois_pattern),
+            ),
+            "email": ("@", (self.email_pattern,)),
+            "adresse": (
+                rf"(?i)(?:{street})\b",
+                (self.adresse_pattern, self.fast_adresse_pattern),
+            ),
+        }
+
+        # Détecteurs sans retour arrière utilisés quand un pattern dépasse
+        # son budget de temps : ils masquent plus large que le pattern
+        self.FALLBACK_PATTERNS = {
+            "<NAME>": r"\b[A-ZÀ-Ÿ][\p{L}'-]*+(?:[ \t]++[A-ZÀ-Ÿ][\p{L}'-]*+)++",
+            "<DATE>": rf"\b\d{{1,2}}(?:[/.-]\d{{1,2}}[/.-]|\s++{mois}\s++)\d{{2,4}}\b",
+            "<EMAIL>": r"[^\s@]++@[^\s@]++",
+            "<ADRESSE>": rf"(?i)\b(?:\d{{1,4}}\s++)?(?:{street})\b[^\n,]{{0,40}}",
+            "<NUMBER>": r"\+?\d(?:[ \t.-]?+\d){6,}+",
+        }
+
+    @property
+    def position(self) -> Dict[Tuple[Tuple[int, int]], str]:
+        """Positions found by the last call."""
+        return self.last_state.position
+
+    @property
+    def skipped_families(self) -> set:
+        """Families skipped by the prefilter during the last call."""
+        return self.last_state.skipped_families
+
+    @property
+    def timeouts(self) -> list:
+        """Patterns over their time budget during the last call."""
+        return self.last_state.timeouts
+
+    @property
+    def compiled_patterns(self) -> Tuple[Tuple[regex.Pattern, str], ...]:
+        """Compiled version of `PATTERNS`, shared between instances."""
+        return compile_pattern_table(tuple(self.PATTERNS.items()))
+
     def _replace(self, match):
         title = match.group("TITLE") if "TITLE" in match.groupdict() else ""
         return title + "<NAME>"
 
-    def multi_subs_by_regex(self, text: str) -> Dict[Tuple[Tuple[int, int]], str]:
+    def _match_span(self, match) -> Tuple[int, int]:
+        """
+        Span of a match. Si on a des groupes nommés LN/FN, on prend
+        uniquement le span englobant ces groupes.
+        """
+        groups = match.groupdict()
+        name_groups = [
+            k
+            for k in groups
+            if (k.startswith("LN") or k.startswith("FN")) and groups[k] is not None
+        ]
+        if name_groups:
+            start = min(match.start(g) for g in name_groups)
+            end = max(match.end(g) for g in name_groups)
+            return (start, end)
+        return match.span()
+
+    def _skipped_patterns(
+        self, text: str, patterns: Tuple[Tuple[str, str], ...], state: AnalysisState
+    ) -> set:
+        """
+        Look for the trigger of each family having patterns in the table and
+        return the patterns of the families whose trigger is absent.
+
+        :param text: text to analyze
+        :param patterns: tuple of (pattern, replacement)
+        :param state: state of the call, receives the skipped families
+        :returns: set of patterns that can't match the text
+        """
+        if not self.prefilter:
+            return set()
+
+        table = {pattern for pattern, _ in patterns}
+        families = tuple(
+            (trigger, name)
+            for name, (trigger, members) in self.FAMILIES.items()
+            if table.intersection(members)
+        )
+        skipped = set()
+        for trigger, name in compile_pattern_table(families):
+            if trigger.search(text) is None:
+                state.skipped_families.add(name)
+                skipped.update(self.FAMILIES[name][1])
+        return skipped
+
+    def _pattern_spans(
+        self, text: str, patterns: Tuple[Tuple[str, str], ...], state: AnalysisState
+    ) -> list:
+        """
+        Run every pattern of the table on the text.
+
+        :param text: text to analyze
+        :param patterns: tuple of (pattern, replacement)
+        :param state: state of the call
+        :returns: list of (pattern, spans, replacement), in table order
+        """
+        skipped = self._skipped_patterns(text, patterns, state)
+        if skipped:
+            patterns = tuple(item for item in patterns if item[0] not in skipped)
+
+        deadline = None
+        if self.document_timeout is not None:
+            deadline = time.perf_counter() + self.document_timeout
+
+        results = []
+        # labels whose cheaper detector already ran on this document
+        fallen_back = set()
+        for pattern, repl in compile_pattern_table(patterns):
+            started = time.perf_counter()
+            timeout = self._timeout(deadline, self.pattern_timeout)
+            try:
+                if timeout is not None and timeout <= 0:
+                    raise TimeoutError("document budget exhausted")
+                spans = [
+                    self._match_span(match)
+                    for match in pattern.finditer(text, overlapped=True, timeout=timeout)
+                ]
+            except TimeoutError:
+                self._report_timeout(text, pattern.pattern, repl, state)
+                spans = []
+                if repl not in fallen_back:
+                    fallen_back.add(repl)
+                    spans = self._fallback_spans(text, repl)
+            if self.profiler is not None:
+                self.profiler.record(
+                    pattern.pattern, repl, time.perf_counter() - started, len(spans)
+                )
+            results.append((pattern.pattern, spans, repl))
+        return results
+
+    @staticmethod
+    def _timeout(deadline: Optional[float], budget: Optional[float] = None) -> Optional[float]:
+        """Smallest of `budget` and the time left before `deadline`."""
+        if deadline is None:
+            return budget
+        left = deadline - time.perf_counter()
+        return left if budget is None else min(budget, left)
+
+    def _fallback_spans(self, text: str, repl: str) -> list:
+        """Spans of the cheaper detector of a label, if there is one."""
+        fallback = self.FALLBACK_PATTERNS.get(repl)
+        if fallback is None:
+            return []
+        pattern = compile_pattern_table(((fallback, repl),))[0][0]
+        return [match.span() for match in pattern.finditer(text)]
+
+    def _report_timeout(self, text: str, pattern: str, repl: str, state: AnalysisState):
+        """Record and warn about a pattern over its time budget."""
+        document = hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+        state.timeouts.append(PatternTimeout(pattern, repl, document))
+        warnings.warn(
+            f"{type(self).__name__}: a {repl} pattern exceeded its "
+            f"time budget on document {document}, falling back to a cheaper detector.",
+            RuntimeWarning,
+            stacklevel=2,
+        )
+
+    def multi_subs_by_regex(
+        self, text: str, state: Optional[AnalysisState] = None
+    ) -> Dict[Tuple[Tuple[int, int]], str]:
         """
         Find word position based on regex
 
         :param text: text to anonymise
+        :param state: AnalysisState receiving the results of the call, a
+            new one by default
         :returns: List of tuples where each tuple contains:
                 - A tuple with the start and end positions of the word.
                 - The replacement string.
         """
-
-        self.position = {}
-
-        for pattern, repl in self.PATTERNS.items():
-            matches_iter = list(regex.finditer(pattern, text, overlapped=True))
-            if not matches_iter:
+        state = state if state is not None else AnalysisState()
+        store = SpanStore()
+        filtered = []
+        for pattern, spans, repl in self._pattern_spans(
+            text, tuple(self.PATTERNS.items()), state
+        ):
+            if not spans:
                 continue
-
-            # spans = [match.span() for match in matches_iter]
-            spans = []
-            for match in matches_iter:
-                groups = match.groupdict()
-                # Si on a des groupes nommés LN/FN, on prend uniquement leur span
-                name_groups = [
-                    k
-                    for k in groups
-                    if (k.startswith("LN") or k.startswith("FN"))
-                    and groups[k] is not None
-                ]
-                if name_groups:
-                    # Prendre le span englobant tous les groupes LN/FN
-                    start = min(match.start(g) for g in name_groups)
-                    end = max(match.end(g) for g in name_groups)
-                    spans.append((start, end))
-                else:
-                    spans.append(match.span())
             # Dédoublonnage : pour les spans overlappants, garder uniquement le plus long
             filtered_spans = self._remove_overlapping_spans(spans)
-            existing_keys = list(self.position.keys())
-            overlapping_keys = []
-            for key in existing_keys:
-                if any(span in key for span in filtered_spans) or any(
-                    k in filtered_spans for k in key
-                ):
-                    overlapping_keys.append(key)
-
-            if overlapping_keys:
-                combined_key = tuple(
-                    sorted(
-                        set(span for key in overlapping_keys for span in key).union(
-                            filtered_spans
-                        )
-                    )
-                )
-                for key in overlapping_keys:
-                    del self.position[key]
-                self.position[combined_key] = repl
-            else:
-                self.position[tuple(filtered_spans)] = repl
+            store.add(filtered_spans, repl)
+            filtered.append((pattern, filtered_spans, repl))
 
         result = {}
-        for k, v in self.position.items():
+        for k, v in store.position.items():
             if v != "<EMAIL>":
                 result[k] = v
                 continue
@@ -260,15 +1263,36 @@ class RegexStrategy(AnalyzerStrategy):
 
             result[tuple(ends.values())] = "<EMAIL>"
 
-        self.position = self._resolve_position_conflicts(result)
-        return self.position
+        state.position = self._resolve_position_conflicts(result)
+        self._record_kept(filtered, state.position)
+        self.last_state = state
+        return state.position
+
+    def _record_kept(self, filtered: list, position: dict):
+        """
+        Count, for each pattern, the spans that survived deduplication and
+        conflict resolution.
+
+        :param filtered: list of (pattern, filtered spans, replacement)
+        :param position: final positions of the call
+        """
+        if self.profiler is None:
+            return
+        kept = {span for key in position for span in key}
+        for pattern, spans, repl in filtered:
+            self.profiler.record_kept(
+                pattern, repl, sum(1 for span in spans if span in kept)
+            )
 
-    def analyze(self, text: str, info: PersonalInfo = None):
+    def analyze(
+        self, text: str, info: PersonalInfo = None, state: Optional[AnalysisState] = None
+    ):
         """
         Hide text using regular expression
         :param text: text to anonymize
+        :param state: optional AnalysisState receiving the results of the call
         """
-        return self.multi_subs_by_regex(text)
+        return self.multi_subs_by_regex(text, state)
 
     def _remove_overlapping_spans(self, spans: list) -> list:
         """
@@ -282,15 +1306,16 @@ class RegexStrategy(AnalyzerStrategy):
         sorted_spans = sorted(spans, key=lambda s: s[1] - s[0], reverse=True)
 
         kept = []
+        # Spans gardés triés par position : ils ne se chevauchent pas, donc le
+        # dernier qui commence avant `end` est aussi celui qui finit le plus tard
+        index = []
         for span in sorted_spans:
             start, end = span
-            # Vérifier si ce span overlap avec un span déjà gardé
-            overlaps = any(
-                not (end <= kept_start or start >= kept_end)
-                for kept_start, kept_end in kept
-            )
-            if not overlaps:
-                kept.append(span)
+            before = bisect_left(index, (end,))
+            if before and index[before - 1][1] > start:
+                continue
+            insort(index, span)
+            kept.append(span)
 
         # Retrier par position
         return sorted(kept, key=lambda s: s[0])
@@ -303,39 +1328,57 @@ class RegexStrategy(AnalyzerStrategy):
         self, positions: Dict[Tuple[Tuple[int, int]], str]
     ) -> Dict[Tuple[Tuple[int, int]], str]:
         """
-        Pour des clés de position qui se chevauchent avec la même valeur,
-        ne garder que la clé avec le span le plus large.
+        Pour des spans qui se chevauchent avec la même valeur, ne garder que
+        leur union, à la place du plus large (le premier en cas d'égalité).
+        Aucun caractère masqué par l'un des spans n'est rendu, et la décision
+        ne dépend que des spans voisins, pas du reste du document.
 
         :param positions: dict avec des tuples de spans comme clés et des remplacements comme valeurs
         :returns: dict filtré sans conflits de positions
         """
-        result = dict(positions)
-        keys = list(result.keys())
-        to_delete = set()
-
-        for i, key1 in enumerate(keys):
-            if key1 in to_delete:
-                continue
-            for key2 in keys[i + 1 :]:
-                if key2 in to_delete:
-                    continue
-                if result[key1] != result[key2]:
+        by_value: Dict[str, list] = {}
+        for index, (key, value) in enumerate(positions.items()):
+            by_value.setdefault(value, []).extend((span, index) for span in key)
+
+        # (span, index) -> union de son groupe, ou None si le span est retiré
+        replaced = {}
+        for spans in by_value.values():
+            spans.sort()
+            cluster, cluster_end = [], None
+            for item in spans:
+                (start, end), _ = item
+                if cluster and start < cluster_end:
+                    cluster.append(item)
+                    cluster_end = max(cluster_end, end)
                     continue
+                self._merge_cluster(cluster, cluster_end, replaced)
+                cluster, cluster_end = [item], end
+            self._merge_cluster(cluster, cluster_end, replaced)
 
-                has_overlap = any(
-                    self._spans_overlap(s1, s2) for s1 in key1 for s2 in key2
-                )
-
-                if has_overlap:
-                    len1 = max(end - start for start, end in key1)
-                    len2 = max(end - start for start, end in key2)
-                    to_delete.add(key1 if len1 < len2 else key2)
-
-        for key in to_delete:
-            del result[key]
-
+        result = {}
+        for index, (key, value) in enumerate(positions.items()):
+            key = tuple(
+                replaced.get((span, index), span)
+                for span in key
+                if replaced.get((span, index), span) is not None
+            )
+            if key:
+                result[key] = value
         return result
 
+    @staticmethod
+    def _merge_cluster(cluster: list, cluster_end: int, replaced: dict):
+        """
+        Replace the widest span of a group of overlapping (span, index) by
+        the union of the group and drop the others.
+        """
+        if len(cluster) < 2:
+            return
+        union = (cluster[0][0][0], cluster_end)
+        widest = min(cluster, key=lambda item: (item[0][0] - item[0][1], item[0]))
+        for item in cluster:
+            replaced[item] = union if item is widest else None
+
 
 class LossyStrategy(RegexStrategy):
     """
@@ -350,8 +1393,17 @@ class LossyStrategy(RegexStrategy):
     maximum anonymization coverage. Information loss is expected and assumed.
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(
+        self,
+        prefilter: bool = True,
+        pattern_timeout: Optional[float] = None,
+        document_timeout: Optional[float] = None,
+    ):
+        super().__init__(
+            prefilter=prefilter,
+            pattern_timeout=pattern_timeout,
+            document_timeout=document_timeout,
+        )
         # self.title_regex = r"([Dd][Rr][.]?|[Dd]octeur|[mM]r?[.]?|[Ii]nterne[ ]*:?|INT|[Ee]xterne[ ]*:?|[Mm]onsieur|[Mm]adame|[Rr].f.rent[ ]*:?|[P][Rr][.]?|[Pp]rofesseure|[Pp]rofesseur|[Mm]me[.]?|[Ee]nfant|[Mm]lle|[Nn]ée?|[Cc]hef(fe)? de service|[Nn]om :)"
         self.LOSSY_PATTERNS = {
             # DUPONT Martin ou DUPONT de TOTO Martin ou DUPONT-TOTO Martin
@@ -382,11 +1434,19 @@ class LossyStrategy(RegexStrategy):
             rf"(?:{self.title_regex}[ \t\n]+)?[A-Z-ÉÈÀÂÊÎÔÛËÏÜÙÇ]\.[ \t]+[A-Z-ÉÈÀÂÊÎÔÛËÏÜÙÇ]{{2,}}([A-Z-ÉÈÀÂÊÎÔÛËÏÜÙÇ]*)": "<NAME>",
         }
 
-    def multi_subs_by_regex(self, text: str) -> Dict[Tuple[Tuple[int, int]], str]:
+    @property
+    def compiled_lossy_patterns(self) -> Tuple[Tuple[regex.Pattern, str], ...]:
+        """Compiled version of `LOSSY_PATTERNS`, shared between instances."""
+        return compile_pattern_table(tuple(self.LOSSY_PATTERNS.items()))
+
+    def multi_subs_by_regex(
+        self, text: str, state: Optional[AnalysisState] = None
+    ) -> Dict[Tuple[Tuple[int, int]], str]:
         """
         Analyze text using an aggressive uppercase-based matching strategy.
 
         :param text: Text to anonymize.
+        :param state: AnalysisState receiving the results of the call.
         :returns: Dictionary mapping span tuples to replacement strings.
 
         .. warning::
@@ -395,45 +1455,31 @@ class LossyStrategy(RegexStrategy):
             is actually a personal identifier.
         """
 
-        self.position = {}
+        state = state if state is not None else AnalysisState()
+        store = SpanStore()
+        filtered = []
         text = text.replace("\x7f", "")
-        for pattern, repl in self.LOSSY_PATTERNS.items():
-            matches_iter = list(regex.finditer(pattern, text, overlapped=True))
-            if not matches_iter:
+        for pattern, spans, repl in self._pattern_spans(
+            text, tuple(self.LOSSY_PATTERNS.items()), state
+        ):
+            if not spans:
                 continue
-
-            spans = [match.span() for match in matches_iter]
             filtered_spans = self._remove_overlapping_spans(spans)
-            existing_keys = list(self.position.keys())
-
-            overlapping_keys = [
-                key
-                for key in existing_keys
-                if any(span in key for span in filtered_spans)
-                or any(k in filtered_spans for k in key)
-            ]
-
-            if overlapping_keys:
-                combined_key = tuple(
-                    sorted(
-                        set(span for key in overlapping_keys for span in key).union(
-                            filtered_spans
-                        )
-                    )
-                )
-                for key in overlapping_keys:
-                    del self.position[key]
-                self.position[combined_key] = repl
-            else:
-                self.position[tuple(filtered_spans)] = repl
+            store.add(filtered_spans, repl)
+            filtered.append((pattern, filtered_spans, repl))
 
-        self.position = self._resolve_position_conflicts(self.position)
-        return self.position
+        state.position = self._resolve_position_conflicts(store.position)
+        self._record_kept(filtered, state.position)
+        self.last_state = state
+        return state.position
 
-    def analyze(self, text: str, info: PersonalInfo = None):
+    def analyze(
+        self, text: str, info: PersonalInfo = None, state: Optional[AnalysisState] = None
+    ):
         """
         Hide text using regular expression
         :param text: text to anonymize
+        :param state: optional AnalysisState receiving the results of the call
         """
         warnings.warn(
             "LossyStrategy.analyze() uses aggressive pattern matching that may cause "
@@ -444,4 +1490,4 @@ class LossyStrategy(RegexStrategy):
             UserWarning,
             stacklevel=2,
         )
-        return self.multi_subs_by_regex(text)
+        return self.multi_subs_by_regex(text, state)
@@ -8,8 +8,33 @@ from datetime import datetime
 from . import analyzer
 from . import mask
 from . import anotate
+import csv
 import json
+import os
+import weakref
+from array import array
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
 from dataclasses import dataclass
+from itertools import islice
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+if TYPE_CHECKING:
+    import asyncio
 
 @dataclass
 class DetectedEntity:
@@ -19,38 +44,239 @@ class DetectedEntity:
     start: int
     end: int
 
+
+class EntityTable:
+    """
+    Entities detected in a text, stored by columns: start, end and code of
+    the replacement in arrays. The originals are sliced from the analyzed
+    texts when asked, the table keeps a reference to these texts instead
+    of a copy of every word.
+
+    Iterating or indexing gives DetectedEntity objects, a slice gives a
+    list of them as the former list of entities did.
+    """
+
+    FIELDS = ("original", "replacement", "type", "start", "end")
+
+    __slots__ = ("starts", "ends", "codes", "sources", "replacements", "texts")
+
+    def __init__(self):
+        self.starts = array("q")
+        self.ends = array("q")
+        self.codes = array("H")
+        self.sources = array("H")
+        self.replacements: list[str] = []
+        self.texts: list[str] = []
+
+    def extend(self, text: str, spans: dict):
+        """
+        Add the spans found by an analyzer in `text`.
+
+        :param text: analyzed text, offsets of the spans point into it
+        :param spans: {((start, end), ...): replacement}
+        """
+        if not spans:
+            return
+        source = len(self.texts)
+        self.texts.append(text)
+        for positions, replacement in spans.items():
+            # quelques types par texte, une liste suffit
+            if replacement in self.replacements:
+                code = self.replacements.index(replacement)
+            else:
+                code = len(self.replacements)
+                self.replacements.append(replacement)
+            for start, end in positions:
+                self.starts.append(start)
+                self.ends.append(end)
+            self.codes.extend([code] * len(positions))
+        self.sources.extend([source] * (len(self.starts) - len(self.sources)))
+
+    def sort(self):
+        """Sort the entities by start, stable."""
+        starts = self.starts
+        if all(starts[i] <= starts[i + 1] for i in range(len(starts) - 1)):
+            return
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        for name in ("starts", "ends", "codes", "sources"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, map(column.__getitem__, order)))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[DetectedEntity, List[DetectedEntity]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        start, end = self.starts[index], self.ends[index]
+        replacement = self.replacements[self.codes[index]]
+        return DetectedEntity(
+            original=self.texts[self.sources[index]][start:end],
+            replacement=replacement,
+            type=replacement.strip("<>"),
+            start=start,
+            end=end,
+        )
+
+    def __iter__(self) -> Iterator[DetectedEntity]:
+        return (self[index] for index in range(len(self)))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (EntityTable, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"EntityTable({list(self)!r})"
+
+    def rows(self) -> Iterator[tuple]:
+        """(original, replacement, type, start, end) of every entity, see `FIELDS`."""
+        types = [replacement.strip("<>") for replacement in self.replacements]
+        texts, replacements = self.texts, self.replacements
+        for start, end, code, source in zip(self.starts, self.ends, self.codes, self.sources):
+            yield texts[source][start:end], replacements[code], types[code], start, end
+
+    def to_numpy(self, originals: bool = False):
+        """
+        Entities as a NumPy structured array with start, end and type
+        fields, plus original if `originals`. Needs numpy.
+
+        :param originals: add the detected words, as an object field
+        :returns: numpy.ndarray
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("EntityTable.to_numpy needs numpy : pip install numpy") from None
+
+        types = [replacement.strip("<>") for replacement in self.replacements]
+        fields = [
+            ("start", numpy.int64),
+            ("end", numpy.int64),
+            ("type", f"U{max(map(len, types), default=1)}"),
+        ]
+        if originals:
+            fields.append(("original", object))
+        table = numpy.empty(len(self), dtype=fields)
+        table["start"] = numpy.frombuffer(self.starts, dtype=numpy.int64)
+        table["end"] = numpy.frombuffer(self.ends, dtype=numpy.int64)
+        if len(self):
+            table["type"] = numpy.array(types)[numpy.frombuffer(self.codes, dtype=numpy.uint16)]
+        if originals:
+            table["original"] = [row[0] for row in self.rows()]
+        return table
+
+    def to_csv(self, file: Union[str, os.PathLike, IO[str]], header: bool = True):
+        """
+        Write the entities as CSV, one row per entity, see `FIELDS`.
+
+        :param file: path or text stream
+        :param header: write the column names first
+        """
+        with _output(file) as f:
+            writer = csv.writer(f)
+            if header:
+                writer.writerow(self.FIELDS)
+            writer.writerows(self.rows())
+
+    def to_jsonl(self, file: Union[str, os.PathLike, IO[str]]):
+        """
+        Write the entities as JSON Lines, one object per entity.
+
+        :param file: path or text stream
+        """
+        fields = self.FIELDS
+        with _output(file) as f:
+            f.writelines(
+                json.dumps(dict(zip(fields, row)), ensure_ascii=False) + "\n"
+                for row in self.rows()
+            )
+
+
+def _output(file: Union[str, os.PathLike, IO[str]]):
+    """Open a path for writing, a stream is used as is and left open."""
+    if isinstance(file, (str, os.PathLike)):
+        return open(file, "w", encoding="utf-8", newline="")
+    return nullcontext(file)
+
+
+class _StrategyRegistry(Mapping):
+    """
+    Strategies by name, each one is created on first access from its
+    class, then the same instance is returned.
+    """
+
+    def __init__(self, factories: Mapping[str, Callable]):
+        self._factories = factories
+        self._instances = {}
+
+    def __getitem__(self, name: str):
+        instance = self._instances.get(name)
+        if instance is None:
+            # deux threads peuvent créer la stratégie, une seule est gardée
+            instance = self._instances.setdefault(name, self._factories[name]())
+        return instance
+
+    def __contains__(self, name) -> bool:
+        return name in self._factories
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._factories)
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+
 class Anonymizer:
     """Anonymization class based on strategies formating"""
 
+    # "sequential" : each analyzer runs on the text masked by the previous one
+    # "single_pass" : every analyzer runs on the original text, spans are
+    # merged and the text is masked once
+    PIPELINES = ("sequential", "single_pass")
+
+    # available strategies, instantiated by ANALYZERS, MASKS and ANNOTATORS
+    # on first use
+    ANALYZER_CLASSES = {
+        "regex": analyzer.RegexStrategy,
+        "pii": analyzer.PiiStrategy,
+        "lossy": analyzer.LossyStrategy,
+    }
+    MASK_CLASSES = {
+        "placeholder": mask.PlaceholderStrategy,
+        "fake": mask.FakeStrategy,
+        "hash": mask.HashStrategy,
+        "hide": mask.HideStrategy,
+    }
+    ANNOTATOR_CLASSES = {
+        "standoff": anotate.StandoffStrategy,
+        "doccano": anotate.DoccanoStrategy,
+        "uimacas": anotate.UimaCasStrategy,
+    }
+
     def __init__(self):
         # available strategies
-        self.ANALYZERS = {
-            "regex": analyzer.RegexStrategy(),
-            "pii": analyzer.PiiStrategy(),
-            "lossy": analyzer.LossyStrategy(),
-        }
+        self.ANALYZERS = _StrategyRegistry(self.ANALYZER_CLASSES)
 
         # available masks
-        self.MASKS = {
-            "placeholder": mask.PlaceholderStrategy(),
-            "fake": mask.FakeStrategy(),
-            "hash": mask.HashStrategy(),
-            "hide": mask.HideStrategy(),
-        }
+        self.MASKS = _StrategyRegistry(self.MASK_CLASSES)
 
         # available annotator
-        self.ANNOTATORS = {
-            "standoff": anotate.StandoffStrategy(),
-            "doccano": anotate.DoccanoStrategy(),
-            "uimacas": anotate.UimaCasStrategy(),
-        }
+        self.ANNOTATORS = _StrategyRegistry(self.ANNOTATOR_CLASSES)
 
         self._infos = None
         self._position = []
-        self._mask = mask.PlaceholderStrategy()
+        self._mask = self.MASKS["placeholder"]
         self._analyzers = []
+        self._pipeline = "sequential"
+        self._async_workers = os.cpu_count() or 1
+        self._executor = None
+        self._semaphores = weakref.WeakKeyDictionary()
         self._annotator = None
-        self._entities: list[DetectedEntity] = []
+        self._capture_entities = True
+        self._entities = EntityTable()
 
     def open_text_file(self, path: str) -> str:
         """
@@ -114,6 +340,48 @@ class Anonymizer:
         self._infos = info_obj
         return info_obj
 
+    def set_gazetteer(self, gazetteer: analyzer.Gazetteer):
+        """
+        Set the gazetteer searched by the pii analyzer in every text
+
+        :param gazetteer: Gazetteer, None to remove it
+        """
+        self.ANALYZERS["pii"].gazetteer = gazetteer
+        return gazetteer
+
+    def set_registry(self, registry: analyzer.PatientRegistry):
+        """
+        Set the patient registry of the pii analyzer, the infos given to
+        `anonymize` can then be the ID of a patient of the registry
+
+        :param registry: PatientRegistry, None to remove it
+        """
+        self.ANALYZERS["pii"].registry = registry
+        if registry is not None:
+            # même décalage des dates pour l'ID et la PersonalInfo du patient
+            self.MASKS["fake"].id_field = registry.id_field
+        return registry
+
+    def set_hash_key(self, key: Union[bytes, str]):
+        """
+        Set the secret key of the hash mask, a same word then gets the
+        same token in every run using this key
+
+        :param key: secret key, at most 64 bytes
+        """
+        self.MASKS["hash"].key = key
+
+    def set_fake_seed(self, seed: Union[bytes, str]):
+        """
+        Set the secret seed of the fake mask and turn its surrogates on, a
+        same word then gets the same surrogate in every run using this seed
+
+        :param seed: secret seed
+        """
+        fake = self.MASKS["fake"]
+        fake.seed = seed
+        fake.surrogates = True
+
     def add_analyzer(self, name: str):
         """
         Add analyser
@@ -151,6 +419,53 @@ class Anonymizer:
         else:
             raise Exception(f"{name} annotator doesn't exist")
 
+    def set_pipeline(self, name: str):
+        """
+        Set how analyzers and mask are chained, see `PIPELINES`
+
+        :param name: wanted pipeline
+        """
+        if name in self.PIPELINES:
+            self._pipeline = name
+        else:
+            raise Exception(f"{name} pipeline doesn't exist")
+
+    @staticmethod
+    def _merge_spans(results: list) -> dict:
+        """
+        Merge the spans found by several analyzers on the same text.
+
+        Overlapping spans are joined so that nothing flagged by an analyzer
+        is left visible, the joined span takes the replacement of its
+        longest span (of the first analyzer on ties).
+
+        :param results: spans dicts, in analyzer order
+        :returns: dict {((start, end),): replacement} without overlaps
+        """
+        flat = sorted(
+            (start, end, rank, replacement)
+            for rank, spans in enumerate(results)
+            for positions, replacement in spans.items()
+            for start, end in positions
+        )
+        merged = {}
+        cluster_start = cluster_end = None
+        # (longueur, -rang) du span qui donne son remplacement au groupe
+        best, chosen = (0, 0), None
+        for start, end, rank, replacement in flat:
+            if cluster_end is not None and start < cluster_end:
+                if (end - start, -rank) > best:
+                    best, chosen = (end - start, -rank), replacement
+                cluster_end = max(cluster_end, end)
+                continue
+            if cluster_end is not None:
+                merged[((cluster_start, cluster_end),)] = chosen
+            cluster_start, cluster_end = start, end
+            best, chosen = (end - start, -rank), replacement
+        if cluster_end is not None:
+            merged[((cluster_start, cluster_end),)] = chosen
+        return merged
+
     def anonymize(self, text: str, infos: PersonalInfo = None) -> str:
         """
         Global function to anonymise a text base on the choosen strategies
@@ -160,34 +475,465 @@ class Anonymizer:
         """
         if not text:
             return "NaN"
-    
-        self._entities = []
+
+        anonymized_text, self._entities = self.anonymize_with_entities(text, infos)
+        return anonymized_text
+
+    def anonymize_with_entities(
+        self, text: str, infos: PersonalInfo = None
+    ) -> Tuple[str, EntityTable]:
+        """
+        Same as `anonymize`, the entities are returned instead of being kept
+        on the anonymizer, so that several threads can share it.
+
+        :param text: text to anonymize
+        :returns: anonimized text and EntityTable, empty when the entity
+            capture is off
+        """
+        entities = EntityTable()
+        if not text:
+            return "NaN", entities
+        anonymized_text = self._anonymize(
+            text, infos, entities if self._capture_entities else None
+        )
+        return anonymized_text, entities
+
+    def anonymize_with_offsets(
+        self, text: str, infos: PersonalInfo = None
+    ) -> Tuple[str, mask.OffsetMap]:
+        """
+        Same as `anonymize`, with the OffsetMap between `text` and the
+        anonymized text, to move annotations from one to the other.
+
+        :param text: text to anonymize
+        :returns: anonimized text and OffsetMap
+        """
+        offsets = mask.OffsetMap()
+        if not text:
+            offsets.add(0, 0, 0, len("NaN"))
+            return "NaN", offsets
+        stages = []
+        anonymized_text = self._anonymize(text, infos, None, stages)
+        for stage in stages:
+            offsets = offsets.compose(stage)
+        return anonymized_text, offsets
+
+    def _anonymize(
+        self,
+        text: str,
+        infos: PersonalInfo,
+        entities: Optional[EntityTable],
+        offsets: Optional[list] = None,
+    ) -> str:
+        """
+        Anonymize `text`, the detected entities are added to `entities`
+        unless it is None, an OffsetMap per masking pass is appended to
+        `offsets` unless it is None.
+        """
+        if not text:
+            return "NaN"
         resolved_infos = infos if infos is not None else self._infos
+        if self._pipeline == "single_pass":
+            return self._anonymize_single_pass(
+                text, resolved_infos, entities, offsets
+            )
         anonymized_text = text
-    
+
         for strategy in self._analyzers:
             spans = strategy.analyze(text=anonymized_text, info=resolved_infos)
-        
-            for positions, replacement in spans.items():
-                for start, end in positions:
-                    self._entities.append(DetectedEntity(
-                        original=anonymized_text[start:end],
-                        replacement=replacement,
-                        type=replacement.strip("<>"),
-                        start=start,
-                        end=end
-                    ))
-        
-            anonymized_text = self._mask.mask(anonymized_text, spans)
-    
-        self._entities.sort(key=lambda e: e.start)
+            if entities is not None:
+                entities.extend(anonymized_text, spans)
+            stage = None
+            if offsets is not None:
+                stage = mask.OffsetMap()
+                offsets.append(stage)
+            anonymized_text = self._mask_text(
+                anonymized_text, spans, resolved_infos, stage
+            )
+
+        if entities is not None:
+            entities.sort()
+        return anonymized_text
+
+    def _anonymize_single_pass(
+        self,
+        text: str,
+        infos: PersonalInfo,
+        entities: Optional[EntityTable],
+        offsets: Optional[list] = None,
+    ) -> str:
+        """
+        Run every analyzer on `text`, then mask the merged spans once.
+        Entities offsets are relative to `text`.
+        """
+        spans = self._merge_spans(
+            [strategy.analyze(text=text, info=infos) for strategy in self._analyzers]
+        )
+        if entities is not None:
+            entities.extend(text, spans)
+        stage = None
+        if offsets is not None:
+            stage = mask.OffsetMap()
+            offsets.append(stage)
+        return self._mask_text(text, spans, infos, stage)
+
+    def set_entity_capture(self, enabled: bool):
+        """
+        Keep or not the detected entities, without them only the
+        anonymized text is built
+
+        :param enabled: False to stop the capture, `get_entities` is then empty
+        """
+        self._capture_entities = enabled
+
+    def anonymize_many(
+        self,
+        documents: Iterable[Tuple[str, Optional[PersonalInfo]]],
+        workers: int = None,
+        ordered: bool = True,
+        chunksize: int = 16,
+        max_in_flight: int = None,
+        executor: str = "process",
+    ) -> Iterator:
+        """
+        Anonymize documents in a pool of processes or threads. Each process
+        receives the configured analyzers and mask once, threads share
+        those of the anonymizer.
+
+        :param documents: iterable of (text, PersonalInfo), read lazily.
+            A None PersonalInfo falls back to the one set on the anonymizer
+        :param workers: number of processes or threads, default to the
+            number of cpus
+        :param ordered: yield the texts in input order, else yield
+            (index, text) tuples as soon as a chunk is done
+        :param chunksize: number of documents sent to a worker at once
+        :param max_in_flight: number of chunks submitted and not yet
+            yielded, default to twice the number of workers. Bounds the
+            memory used by pending documents and results
+        :param executor: "process" or "thread". Threads only run in
+            parallel while the regex engine releases the GIL, or on a
+            free-threaded build
+        :returns: iterator of anonymized texts, or of (index, text)
+        :raises Exception: if the executor doesn't exist
+        :raises ValueError: if workers, chunksize or max_in_flight is not
+            a positive number
+        """
+        # vérifiés ici plutôt qu'au premier next() du générateur
+        if executor not in ("process", "thread"):
+            raise Exception(f"{executor} executor doesn't exist")
+        for name, value in (
+            ("workers", workers), ("chunksize", chunksize), ("max_in_flight", max_in_flight)
+        ):
+            if value is not None and value < 1:
+                raise ValueError(f"{name} must be at least 1, got {value}")
+        workers = workers or os.cpu_count() or 1
+        max_in_flight = max_in_flight or 2 * workers
+        return self._anonymize_many(
+            iter(documents), workers, ordered, chunksize, max_in_flight, executor
+        )
+
+    def _anonymize_many(
+        self,
+        documents: Iterator,
+        workers: int,
+        ordered: bool,
+        chunksize: int,
+        max_in_flight: int,
+        executor: str,
+    ) -> Iterator:
+        """Generator of `anonymize_many`, once the arguments are checked."""
+
+        def chunks():
+            while True:
+                chunk = [
+                    (text, infos if infos is not None else self._infos)
+                    for text, infos in islice(documents, chunksize)
+                ]
+                if not chunk:
+                    return
+                yield chunk
+
+        if executor == "process":
+            # multiprocessing n'est importé que pour ce cas
+            from concurrent.futures import ProcessPoolExecutor
+
+            pool = ProcessPoolExecutor(
+                workers,
+                initializer=_init_worker,
+                initargs=(self._analyzers, self._mask, self._pipeline),
+            )
+            function = _anonymize_chunk_in_worker
+        else:
+            pool = ThreadPoolExecutor(workers)
+            function = self._anonymize_chunk
+        try:
+            if ordered:
+                yield from self._ordered_results(pool, function, chunks(), max_in_flight)
+            else:
+                yield from self._completed_results(pool, function, chunks(), max_in_flight)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _anonymize_chunk(self, chunk: list) -> list:
+        return [self._anonymize(text, infos, None) for text, infos in chunk]
+
+    @staticmethod
+    def _ordered_results(pool, function, chunks, max_in_flight: int) -> Iterator[str]:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(function, chunk))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+    @staticmethod
+    def _completed_results(
+        pool, function, chunks, max_in_flight: int
+    ) -> Iterator[Tuple[int, str]]:
+        pending = {}
+        index = 0
+        for chunk in chunks:
+            pending[pool.submit(function, chunk)] = index
+            index += len(chunk)
+            if len(pending) < max_in_flight:
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from enumerate(future.result(), pending.pop(future))
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from enumerate(future.result(), pending.pop(future))
+
+    def anonymize_chunks(
+        self,
+        chunks: Iterable[str],
+        infos: PersonalInfo = None,
+        window: int = 1 << 16,
+        overlap: int = 4096,
+    ) -> Iterator[str]:
+        """
+        Anonymize a text given in pieces and yield the output as it goes,
+        the concatenated output is the one of `anonymize` on the whole text.
+
+        The text is analyzed by windows of about `window` characters. Each
+        window is cut on a line break and also sees `overlap` characters of
+        context on each side, which must be longer than any match. A cut is
+        delayed while a span crosses it. Memory depends on `window` and
+        `overlap`, not on the size of the text. Entities are not collected.
+
+        :param chunks: iterable of strings, e.g. a file read by blocks
+        :param infos: PersonalInfo, default to the one set on the anonymizer
+        :param window: characters committed per window
+        :param overlap: characters of context around a window
+        :returns: iterator of anonymized pieces
+        """
+        infos = infos if infos is not None else self._infos
+        buffer = ""
+        # buffer[:start] : contexte gauche déjà rendu
+        start = 0
+        empty = True
+        for chunk in chunks:
+            buffer += chunk
+            empty = empty and not chunk
+            while len(buffer) - start >= window + overlap:
+                limit = len(buffer) - overlap
+                cut = buffer.rfind("\n", start, limit) + 1 or limit
+                output = self._anonymize_window(buffer, start, cut, infos)
+                if output is None:
+                    # un span traverse la coupe : on attend plus de texte
+                    break
+                yield output
+                keep = max(cut - overlap, 0)
+                buffer = buffer[keep:]
+                start = cut - keep
+        if empty:
+            yield "NaN"
+        elif len(buffer) > start:
+            yield self._anonymize_window(buffer, start, len(buffer), infos)
+
+    def anonymize_file(
+        self,
+        input_path: str,
+        output_path: str,
+        infos: PersonalInfo = None,
+        window: int = 1 << 16,
+        overlap: int = 4096,
+    ):
+        """
+        Anonymize a text file without loading it whole, see `anonymize_chunks`
+
+        :param input_path: path of the txt file to anonymize
+        :param output_path: path of the anonymized file
+        """
+        with open(input_path, "r") as source, open(output_path, "w") as output:
+            chunks = iter(lambda: source.read(window), "")
+            for piece in self.anonymize_chunks(chunks, infos, window, overlap):
+                output.write(piece)
+
+    def _mask_text(
+        self,
+        text: str,
+        spans: dict,
+        infos: PersonalInfo,
+        offsets: Optional[mask.OffsetMap] = None,
+    ) -> str:
+        """
+        Mask `text`, the fake mask shifts the dates of the patient `infos`.
+        The replaced spans are recorded in `offsets` unless it is None.
+        """
+        if offsets is None:
+            if isinstance(self._mask, mask.FakeStrategy):
+                return self._mask.mask(text, spans, infos=infos)
+            return self._mask.mask(text, spans)
+        if isinstance(self._mask, mask.FakeStrategy):
+            return self._mask.mask(text, spans, infos=infos, offsets=offsets)
+        return self._mask.mask(text, spans, offsets=offsets)
+
+    def _anonymize_window(
+        self, text: str, start: int, end: int, infos: PersonalInfo
+    ) -> Optional[str]:
+        """
+        Anonymize `text` and return the output of text[start:end].
+
+        The spans crossing `start` were already dealt with by the previous
+        window and are ignored.
+
+        :returns: output of text[start:end], None if a span crosses `end`
+        """
+        if self._pipeline == "single_pass":
+            stages = [lambda text: self._merge_spans(
+                [strategy.analyze(text=text, info=infos) for strategy in self._analyzers]
+            )]
+        else:
+            stages = [
+                lambda text, strategy=strategy: strategy.analyze(text=text, info=infos)
+                for strategy in self._analyzers
+            ]
+        for stage in stages:
+            spans = [
+                (span, replacement)
+                for positions, replacement in stage(text).items()
+                for span in positions
+                if not span[0] < start < span[1]
+            ]
+            if any(span_start < end < span_end for (span_start, span_end), _ in spans):
+                return None
+            # position des bornes dans le texte masqué
+            start, end = (
+                len(self._mask_text(text[:bound], {(span,): r for span, r in spans if span[1] <= bound}, infos))
+                for bound in (start, end)
+            )
+            text = self._mask_text(text, {(span,): r for span, r in spans}, infos)
+        return text[start:end]
+
+    def set_async_workers(self, workers: int):
+        """
+        Set the number of threads of the async API, which is also the
+        number of documents anonymized at once. The calls above it wait
+        their turn without blocking the event loop.
+
+        :param workers: number of threads
+        """
+        self.close()
+        self._async_workers = workers
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def close(self):
+        """Shut down the threads of the async API, they restart on demand."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _async_slot(self) -> asyncio.Semaphore:
+        """Semaphore bounding the concurrent calls of the running loop."""
+        # asyncio est déjà chargé par la boucle qui appelle
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self._async_workers)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self._async_workers, thread_name_prefix="incognito"
+            )
+        return semaphore
+
+    async def anonymize_async(self, text: str, infos: PersonalInfo = None) -> str:
+        """
+        Anonymize a text in a thread without blocking the event loop.
+        Cancelling the call drops the text if its anonymization didn't
+        start yet.
+
+        :param text: text to anonymize
+        :param infos: PersonalInfo, default to the one set on the anonymizer
+        :returns: anonimized text
+        """
+        import asyncio
+
+        async with self._async_slot():
+            loop = asyncio.get_running_loop()
+            anonymized_text = await loop.run_in_executor(
+                self._executor, self._anonymize, text, infos, None
+            )
         return anonymized_text
 
-    def get_entities(self) -> list[DetectedEntity]:
+    async def anonymize_stream(
+        self,
+        documents: Union[
+            Iterable[Tuple[str, Optional[PersonalInfo]]],
+            AsyncIterable[Tuple[str, Optional[PersonalInfo]]],
+        ],
+        ordered: bool = True,
+    ) -> AsyncIterator:
+        """
+        Async iterator anonymizing a stream of documents. The documents are
+        read only when a thread is free, so a slow consumer slows down the
+        reading of the source.
+
+        :param documents: iterable or async iterable of (text, PersonalInfo)
+        :param ordered: yield the texts in input order, else yield
+            (index, text) tuples as soon as they are done
+        :returns: async iterator of anonymized texts, or of (index, text)
+        """
+        import asyncio
+
+        if not hasattr(documents, "__aiter__"):
+            documents = _as_async_iterable(documents)
+        limit = self._async_workers
+        pending = deque()
+        try:
+            index = 0
+            async for text, infos in documents:
+                task = asyncio.ensure_future(self.anonymize_async(text, infos))
+                pending.append((index, task))
+                index += 1
+                if len(pending) < limit:
+                    continue
+                if ordered:
+                    _, task = pending.popleft()
+                    yield await task
+                else:
+                    async for result in _first_completed(pending):
+                        yield result
+            while pending:
+                if ordered:
+                    _, task = pending.popleft()
+                    yield await task
+                else:
+                    async for result in _first_completed(pending):
+                        yield result
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    def get_entities(self) -> EntityTable:
         """
         Function to get matched entites in anonymisation.
 
-        :returns: DetectedEntity class list
+        :returns: EntityTable, iterable of DetectedEntity
         """
         return self._entities
     
@@ -207,3 +953,105 @@ class Anonymizer:
         if self._annotator:
             annotated_text = self._annotator.annotate(text, spans)
         return annotated_text
+
+    def _annotation_spans(self, text: str, infos: Optional[PersonalInfo]) -> dict:
+        """Spans of every analyzer on `text`, as in `annotate`."""
+        resolved_infos = infos if infos is not None else self._infos
+        spans = {}
+        for strategy in self._analyzers:
+            spans.update(strategy.analyze(text=text, info=resolved_infos))
+        return spans
+
+    def annotate_corpus(
+        self,
+        documents: Iterable[Tuple[str, Optional[PersonalInfo]]],
+        output_path: str,
+        compress: Optional[bool] = None,
+        flush_every: int = 1000,
+        resume: bool = False,
+        append: bool = False,
+    ) -> int:
+        """
+        Annotate documents into one Doccano JSONL file, written through a
+        single handle, see `anotate.DoccanoWriter`
+
+        :param documents: iterable of (text, PersonalInfo), None for the
+            infos of the anonymizer
+        :param output_path: path of the jsonl file, gzip compressed if it
+            ends with .gz (or if `compress`)
+        :param flush_every: number of documents between two checkpoints
+        :param resume: skip the documents written by a previous run, up to
+            its last checkpoint
+        :param append: keep the records already in the file and write every
+            document after them
+        :returns: number of documents in the file
+        """
+        with anotate.DoccanoWriter(
+            output_path, compress, flush_every, resume, append=append
+        ) as writer:
+            skipped = 0 if append else writer.documents
+            for text, infos in islice(documents, skipped, None):
+                writer.write(text, self._annotation_spans(text, infos))
+        return writer.documents
+
+    def annotate_to_directory(
+        self,
+        documents: Iterable[Tuple[str, str, Optional[PersonalInfo]]],
+        directory: str,
+        format: str = "xmi",
+        workers: int = None,
+    ) -> List[str]:
+        """
+        Annotate documents into UIMA CAS files, see
+        `anotate.UimaCasStrategy.save_many`. The analyzers run here, the CAS
+        are built and serialized in a pool of processes.
+
+        :param documents: iterable of (name, text, PersonalInfo), None for
+            the infos of the anonymizer
+        :param directory: output directory, one name.xmi (or .json) per document
+        :param format: "xmi" or "json"
+        :param workers: number of processes, default to the number of cpus
+        :returns: paths of the written files
+        """
+        annotator = self._annotator
+        if not isinstance(annotator, anotate.UimaCasStrategy):
+            annotator = self.ANNOTATORS["uimacas"]
+
+        def annotated():
+            for name, text, infos in documents:
+                yield name, text, self._annotation_spans(text, infos)
+
+        return annotator.save_many(annotated(), directory, format, workers)
+
+
+# Anonymizer of a worker process of `Anonymizer.anonymize_many`
+_worker_anonymizer: Optional[Anonymizer] = None
+
+
+def _init_worker(analyzers: list, mask, pipeline: str):
+    global _worker_anonymizer
+    _worker_anonymizer = Anonymizer()
+    _worker_anonymizer._analyzers = analyzers
+    _worker_anonymizer._mask = mask
+    _worker_anonymizer._pipeline = pipeline
+
+
+def _anonymize_chunk_in_worker(chunk: list) -> list:
+    return _worker_anonymizer._anonymize_chunk(chunk)
+
+
+async def _as_async_iterable(documents: Iterable) -> AsyncIterator:
+    for document in documents:
+        yield document
+
+
+async def _first_completed(pending: deque) -> AsyncIterator[Tuple[int, str]]:
+    """Wait for the first tasks of `pending` to finish and yield them."""
+    import asyncio
+
+    done, _ = await asyncio.wait(
+        [task for _, task in pending], return_when=asyncio.FIRST_COMPLETED
+    )
+    for item in [item for item in pending if item[1] in done]:
+        pending.remove(item)
+        yield item[0], item[1].result()
@@ -1,6 +1,12 @@
-from typing import Dict, List, Tuple
-from cassis import Cas
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from collections import deque
+from itertools import islice
+import io
 import json
+import os
+
+if TYPE_CHECKING:
+    from cassis import Cas, TypeSystem
 
 """
     Classes to annotate the word at the given coordinates
@@ -30,6 +36,11 @@ class StandoffStrategy(Strategy):
 class DoccanoStrategy(Strategy):
     def annotate(self, text, coordinate: Dict[List[Tuple], str]):
         """Generate Doccano jsonl format annotations"""
+        return json.dumps(self.record(text, coordinate), ensure_ascii=False)
+
+    @staticmethod
+    def record(text, coordinate: Dict[List[Tuple], str]) -> dict:
+        """Doccano record of `text`, {"text": text, "label": [[start, end, label], ...]}"""
         label_data = []
         for spans, label in coordinate.items():
             label = label.strip("<>")
@@ -38,46 +49,252 @@ class DoccanoStrategy(Strategy):
 
         # Tri optionnel des labels selon la position de début
         label_data.sort(key=lambda x: x[0])
-        return json.dumps({
+        return {
             "text": text,
             "label": label_data
-        }, ensure_ascii=False)
+        }
+
+
+class DoccanoWriter:
+    """
+    Write Doccano records to one JSONL file through a single buffered
+    handle, gzip compressed if `compress` (by default when the path ends
+    with .gz).
+
+    Every `flush_every` records the file is flushed and a checkpoint
+    (records written, size of the file) is saved in `<path>.offset`. With
+    `resume=True` the file is cut back to the last checkpoint and
+    `documents` is the number of records already written, to skip them.
+    Without checkpoint, or with `append=True`, the records already in the
+    file are read back instead: the new ones are written after them, only
+    a record cut by a crash at the end of the file is dropped. A
+    compressed file is written as one gzip member per checkpoint so that
+    it can be cut between two members.
+
+    Example :
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "corpus.jsonl")
+    >>> with DoccanoWriter(path) as writer:
+    ...     writer.write("Bob et Alice", {((0, 3), (7, 12)): "<NAME>"})
+    >>> print(open(path, encoding="utf-8").read(), end="")
+    {"text": "Bob et Alice", "label": [[0, 3, "NAME"], [7, 12, "NAME"]]}
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        compress: Optional[bool] = None,
+        flush_every: int = 1000,
+        resume: bool = False,
+        buffer_size: int = 1 << 20,
+        append: bool = False,
+    ):
+        """
+        :param path: path of the jsonl file
+        :param compress: gzip the file, None to decide from the extension
+        :param flush_every: number of records between two checkpoints
+        :param resume: append to the file from its last checkpoint instead
+            of starting it again
+        :param buffer_size: size of the write buffer, in bytes
+        :param append: write after the records already in the file
+        :raises ValueError: if the file to append to has a line that isn't
+            a Doccano record
+        """
+        self.path = os.fspath(path)
+        self.compress = self.path.endswith(".gz") if compress is None else compress
+        self.flush_every = flush_every
+        self.checkpoint_path = self.path + ".offset"
+        self.documents = 0
+        offset = 0
+        separator = False
+        mode = "wb"
+        if resume or append:
+            # jamais "wb" ici : le fichier existant n'est coupé qu'après offset
+            mode = "xb"
+            if os.path.exists(self.path):
+                mode = "r+b"
+                self.documents, offset = self.read_checkpoint(self.checkpoint_path)
+                size = os.path.getsize(self.path)
+                # un checkpoint qui ne correspond pas au fichier est ignoré
+                if not offset or offset > size or (append and offset != size):
+                    self.documents, offset, separator = self.read_records(
+                        self.path, self.compress
+                    )
+        self._raw = open(self.path, mode, buffering=buffer_size)
+        if mode == "r+b":
+            # ce qui suit le dernier checkpoint est réécrit
+            self._raw.seek(offset)
+            self._raw.truncate()
+        self._out = self._member()
+        if separator:
+            # dernier enregistrement sans fin de ligne
+            self._out.write(b"\n")
+        self._encoder = json.JSONEncoder(ensure_ascii=False)
+        self._pending = 0
+
+    @staticmethod
+    def read_checkpoint(checkpoint_path: str) -> Tuple[int, int]:
+        """
+        :returns: (records written, size of the file) of the last
+            checkpoint, (0, 0) if there isn't any
+        """
+        try:
+            with open(checkpoint_path, "r") as f:
+                documents, offset = f.read().split()
+        except FileNotFoundError:
+            return 0, 0
+        return int(documents), int(offset)
+
+    @staticmethod
+    def read_records(path: str, compress: bool) -> Tuple[int, int, bool]:
+        """
+        Read back the records of a file, for a file without checkpoint.
+
+        :param path: path of the jsonl file
+        :param compress: the file is gzip compressed
+        :returns: (records, size of the file up to the last complete record
+            or gzip member, whether this record has no line break)
+        :raises ValueError: if a complete line isn't a Doccano record
+        """
+        with open(path, "rb") as f:
+            if not compress:
+                documents, offset, _ = DoccanoWriter._records(path, f, 1)
+                f.seek(max(offset - 1, 0))
+                return documents, offset, offset > 0 and f.read(1) != b"\n"
+
+            import zlib
+
+            documents = offset = fed = 0
+            number = 1
+            last = b""
+            member, parts = zlib.decompressobj(wbits=31), []
+            for data in iter(lambda: f.read(1 << 20), b""):
+                fed += len(data)
+                while data:
+                    try:
+                        parts.append(member.decompress(data))
+                    except zlib.error:
+                        raise ValueError(f"{path}: invalid gzip member at byte {offset}")
+                    if not member.eof:
+                        break
+                    # membre complet : ses enregistrements sont gardés
+                    data = member.unused_data
+                    last = b"".join(parts)
+                    read, size, number = DoccanoWriter._records(path, io.BytesIO(last), number)
+                    if size < len(last):
+                        raise ValueError(f"{path}: line {number} is not a Doccano record")
+                    documents += read
+                    offset = fed - len(data)
+                    member, parts = zlib.decompressobj(wbits=31), []
+            return documents, offset, bool(last) and not last.endswith(b"\n")
+
+    @staticmethod
+    def _records(path: str, lines: Iterable[bytes], number: int) -> Tuple[int, int, int]:
+        """
+        Count the Doccano records of `lines`, numbered from `number`.
+
+        :returns: (records, size up to the end of the last record, number
+            of the next line)
+        :raises ValueError: if a line isn't a record, except a last line
+            without line break, cut by a crash
+        """
+        documents = size = 0
+        for line in lines:
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict) or "text" not in record:
+                    if not line.endswith(b"\n"):
+                        break
+                    raise ValueError(f"{path}: line {number} is not a Doccano record")
+                documents += 1
+            size += len(line)
+            number += 1
+        return documents, size, number
+
+    def _member(self):
+        if self.compress:
+            import gzip
+
+            return gzip.GzipFile(fileobj=self._raw, mode="wb", mtime=0)
+        return self._raw
+
+    def write(self, text: str, coordinate: Dict[List[Tuple], str]):
+        """Add the record of `text` and its spans, see `DoccanoStrategy.record`"""
+        line = self._encoder.encode(DoccanoStrategy.record(text, coordinate))
+        self._out.write(line.encode("utf-8"))
+        self._out.write(b"\n")
+        self.documents += 1
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.checkpoint()
+
+    def checkpoint(self) -> Tuple[int, int]:
+        """
+        Flush the records and save the checkpoint
+
+        :returns: (records written, size of the file)
+        """
+        return self._checkpoint(reopen=True)
+
+    def _checkpoint(self, reopen: bool) -> Tuple[int, int]:
+        if self.compress:
+            # fin du membre gzip, le fichier reste ouvert
+            self._out.close()
+        self._raw.flush()
+        offset = self._raw.tell()
+        temporary = self.checkpoint_path + ".tmp"
+        with open(temporary, "w") as f:
+            f.write(f"{self.documents} {offset}\n")
+        os.replace(temporary, self.checkpoint_path)
+        if reopen and self.compress:
+            self._out = self._member()
+        self._pending = 0
+        return self.documents, offset
+
+    def close(self):
+        """Save a last checkpoint and close the file"""
+        if self._raw.closed:
+            return
+        try:
+            self._checkpoint(reopen=False)
+        finally:
+            self._raw.close()
+
+    def __enter__(self) -> "DoccanoWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
 
 
 class UimaCasStrategy(Strategy):
     """Stratégie pour créer des annotations au format UIMA CAS."""
-    
+
+    FORMATS = ("xmi", "json")
+
     def __init__(self, type_name: str = 'custom.NamedEntity'):
         """
         Args:
             type_name: Nom du type d'annotation à créer dans le CAS
         """
         self.type_name = type_name
-    
-    def annotate(self, text: str, coordinate: Dict[Tuple[Tuple[int, int], ...], str]) -> Cas:
+        self._typesystem = None
+
+    @property
+    def typesystem(self) -> "TypeSystem":
         """
-        Crée un UIMA CAS avec les annotations fournies.
-        
-        Args:
-            text: Le texte source
-            coordinate: Dictionnaire {((start1, end1), (start2, end2), ...): '<LABEL>'}
-                       Exemple: {((77, 95), (128, 151)): '<n>', ((14, 24),): '<DATE>'}
-        
-        Returns:
-            Cas: Objet UIMA CAS avec les annotations
+        Type system des CAS, créé au premier appel puis partagé par tous
+        les CAS de la stratégie.
         """
-        # Créer un CAS vide
-        cas = Cas()
-        
-        # Ajouter le texte
-        cas.sofa_string = text
-        
-        # Définir le type d'annotation
-        typesystem = cas.typesystem
-        
-        # Créer un type personnalisé si nécessaire
-        if not typesystem.contains_type(self.type_name):
+        if self._typesystem is None:
+            # cassis n'est importé que pour cette stratégie
+            from cassis import TypeSystem
+
+            typesystem = TypeSystem()
             NamedEntityType = typesystem.create_type(
                 self.type_name,
                 supertypeName='uima.tcas.Annotation'
@@ -87,22 +304,147 @@ class UimaCasStrategy(Strategy):
                 'label',
                 'uima.cas.String'
             )
-        
-        # Récupérer le type
+            self._typesystem = typesystem
+        return self._typesystem
+
+    def __getstate__(self) -> dict:
+        # le type system est recréé à la demande
+        return {"type_name": self.type_name}
+
+    def __setstate__(self, state: dict):
+        self.__init__(**state)
+
+    def annotate(self, text: str, coordinate: Dict[Tuple[Tuple[int, int], ...], str]) -> "Cas":
+        """
+        Crée un UIMA CAS avec les annotations fournies.
+
+        Args:
+            text: Le texte source
+            coordinate: Dictionnaire {((start1, end1), (start2, end2), ...): '<LABEL>'}
+                       Exemple: {((77, 95), (128, 151)): '<n>', ((14, 24),): '<DATE>'}
+
+        Returns:
+            Cas: Objet UIMA CAS avec les annotations
+        """
+        from cassis import Cas
+
+        typesystem = self.typesystem
+        cas = Cas(typesystem=typesystem, sofa_string=text)
         NamedEntity = typesystem.get_type(self.type_name)
-        
-        # Parcourir le dictionnaire et ajouter les annotations
-        for spans_tuple, label in coordinate.items():
-            # Chaque spans_tuple contient un ou plusieurs (start, end)
-            for start, end in spans_tuple:
-                annotation = NamedEntity(begin=start, end=end, label=label)
-                cas.add(annotation)
+        # Chaque spans_tuple contient un ou plusieurs (start, end)
+        cas.add_all([
+            NamedEntity(begin=start, end=end, label=label)
+            for spans_tuple, label in coordinate.items()
+            for start, end in spans_tuple
+        ])
         return cas
-    
-    def save_to_json(self, cas: Cas, output_path: str):
+
+    def annotate_many(
+        self, documents: Iterable[Tuple[str, Dict[Tuple[Tuple[int, int], ...], str]]]
+    ) -> Iterator["Cas"]:
+        """
+        Crée les CAS de plusieurs documents, avec le même type system.
+
+        Args:
+            documents: (texte, coordinate) de chaque document, lus au fur et à mesure
+
+        Returns:
+            Itérateur des CAS, dans l'ordre des documents
+        """
+        for text, coordinate in documents:
+            yield self.annotate(text, coordinate)
+
+    def save_many(
+        self,
+        documents: Iterable[Tuple[str, str, Dict[Tuple[Tuple[int, int], ...], str]]],
+        directory: Union[str, os.PathLike],
+        format: str = "xmi",
+        workers: int = None,
+        chunksize: int = 16,
+        pretty_print: bool = True,
+    ) -> List[str]:
+        """
+        Crée et sauvegarde les CAS de plusieurs documents dans `directory`,
+        dans un pool de processus. Chaque processus crée le type system une
+        seule fois. En XMI le type system est écrit une fois, dans
+        `directory/TypeSystem.xml`.
+
+        Args:
+            documents: (nom, texte, coordinate) de chaque document, sauvegardé
+                dans directory/nom.xmi (ou .json), lus au fur et à mesure
+            directory: Dossier de sortie, créé si besoin
+            format: "xmi" ou "json"
+            workers: Nombre de processus, par défaut le nombre de cpus. Avec 1
+                les CAS sont créés dans le processus courant
+            chunksize: Nombre de documents envoyés à la fois à un processus
+
+        Returns:
+            Chemins des fichiers écrits, dans l'ordre des documents
+        """
+        if format not in self.FORMATS:
+            raise Exception(f"{format} format doesn't exist")
+        directory = os.fspath(directory)
+        os.makedirs(directory, exist_ok=True)
+        if format == "xmi":
+            self.typesystem.to_xml(os.path.join(directory, "TypeSystem.xml"))
+        workers = workers or os.cpu_count() or 1
+        documents = iter(documents)
+        chunks = iter(lambda: list(islice(documents, chunksize)), [])
+        if workers == 1:
+            return [
+                path
+                for chunk in chunks
+                for path in self._save_chunk(chunk, directory, format, pretty_print)
+            ]
+
+        # multiprocessing n'est importé que pour ce cas
+        from concurrent.futures import ProcessPoolExecutor
+
+        paths = []
+        pending = deque()
+        with ProcessPoolExecutor(
+            workers, initializer=_init_cas_worker, initargs=(self.type_name,)
+        ) as pool:
+            for chunk in chunks:
+                pending.append(pool.submit(
+                    _save_chunk_in_worker, chunk, directory, format, pretty_print
+                ))
+                # au plus 2 morceaux par processus en attente
+                if len(pending) >= 2 * workers:
+                    paths.extend(pending.popleft().result())
+            while pending:
+                paths.extend(pending.popleft().result())
+        return paths
+
+    def _save_chunk(self, chunk: list, directory: str, format: str, pretty_print: bool) -> List[str]:
+        paths = []
+        for name, text, coordinate in chunk:
+            cas = self.annotate(text, coordinate)
+            path = os.path.join(directory, f"{name}.{format}")
+            if format == "xmi":
+                cas.to_xmi(path, pretty_print=pretty_print)
+            else:
+                cas.to_json(path, pretty_print=pretty_print)
+            paths.append(path)
+        return paths
+
+    def save_to_json(self, cas: "Cas", output_path: str):
         """Sauvegarde le CAS en JSON."""
         cas.to_json(output_path, pretty_print=True)
-    
-    def save_to_xmi(self, cas: Cas, output_path: str):
+
+    def save_to_xmi(self, cas: "Cas", output_path: str):
         """Sauvegarde le CAS en XMI (format XML UIMA standard)."""
         cas.to_xmi(output_path, pretty_print=True)
+
+
+# UimaCasStrategy d'un processus de `UimaCasStrategy.save_many`
+_worker_cas_strategy: Optional[UimaCasStrategy] = None
+
+
+def _init_cas_worker(type_name: str):
+    global _worker_cas_strategy
+    _worker_cas_strategy = UimaCasStrategy(type_name)
+
+
+def _save_chunk_in_worker(chunk: list, directory: str, format: str, pretty_print: bool) -> List[str]:
+    return _worker_cas_strategy._save_chunk(chunk, directory, format, pretty_print)
@@ -1,7 +1,7 @@
 import argparse
 import os
+from . import analyzer
 from . import anonymizer
-from cassis import Cas
 
 class AnonymiserCli:
     """Class pour utiliser le CLI"""
@@ -14,7 +14,7 @@ class AnonymiserCli:
             "--input",
             "--input_file",
             type=str,
-            help="Chemin du fichier à anonymiser.",
+            help="Chemin du fichier à anonymiser (ou dossier de fichiers .txt avec les annotators doccano et uimacas).",
             required=True,
         )
         parser.add_argument(
@@ -32,6 +32,13 @@ class AnonymiserCli:
             required=False,
         )
 
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Reprend un corpus doccano (--input dossier) au dernier checkpoint au lieu de le réécrire.",
+            required=False,
+        )
+
         parser.add_argument(
             "-s",
             "--strategies",
@@ -39,7 +46,7 @@ class AnonymiserCli:
             help="Stratégies à utiliser (default : %(default)s).",
             default=["regex", "pii"],
             nargs="*",
-            choices=[key for key, val in anonymizer.Anonymizer().ANALYZERS.items()],
+            choices=list(anonymizer.Anonymizer.ANALYZER_CLASSES),
         )
         group = parser.add_mutually_exclusive_group(required=True)
         group.add_argument(
@@ -49,7 +56,7 @@ class AnonymiserCli:
             help="Mask à utiliser (default : %(default)s).",
             default=None,
             nargs=1,
-            choices=[key for key, val in anonymizer.Anonymizer().MASKS.items()],
+            choices=list(anonymizer.Anonymizer.MASK_CLASSES),
             required=False,
         )
         group.add_argument(
@@ -59,7 +66,38 @@ class AnonymiserCli:
             help="Annotator à utiliser (default : %(default)s).",
             default=None,
             nargs=1,
-            choices=[key for key, val in anonymizer.Anonymizer().ANNOTATORS.items()],
+            choices=list(anonymizer.Anonymizer.ANNOTATOR_CLASSES),
+            required=False,
+        )
+
+        parser.add_argument(
+            "--gazetteer",
+            type=str,
+            help="Fichier csv (mot,remplacement) ou gazetteer compilé d'identifiants à masquer dans tous les textes.",
+            default=None,
+            required=False,
+        )
+
+        parser.add_argument(
+            "--hash-key-file",
+            type=str,
+            help="Fichier contenant la clé secrète du mask hash (sinon clé aléatoire, hash différents à chaque exécution).",
+            default=None,
+            required=False,
+        )
+
+        parser.add_argument(
+            "--fake-seed-file",
+            type=str,
+            help="Fichier contenant la graine secrète du mask fake : active les substituts (sinon placeholders fixes), les mêmes à chaque exécution.",
+            default=None,
+            required=False,
+        )
+
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            help="Anonymise le fichier par fenêtres sans le charger en entier (sans annotator).",
             required=False,
         )
 
@@ -127,7 +165,16 @@ class AnonymiserCli:
             json_file = args.json
             infos = ano.open_json_file(json_file[0])
             ano.infos = ano.set_info(infos)
-        ano.text = ano.open_text_file(input_file)
+        stream = args.stream and not annotator
+        # un dossier de textes est annoté dans un seul fichier jsonl (doccano)
+        # ou dans un dossier de CAS json (uimacas)
+        corpus = (
+            bool(annotator)
+            and annotator[0] in ("doccano", "uimacas")
+            and os.path.isdir(input_file)
+        )
+        if not stream and not corpus:
+            ano.text = ano.open_text_file(input_file)
 
         if command == "infos":
             first_name = args.first_name
@@ -151,6 +198,17 @@ class AnonymiserCli:
                       birthdate, ipp, postal_code, adress]
             infos_dict = {key: value for key, value in zip(keys, values)}
             ano.infos = ano.set_info_from_dict(**infos_dict)
+        if args.gazetteer:
+            if analyzer.MappedGazetteer.is_compiled(args.gazetteer):
+                ano.set_gazetteer(analyzer.MappedGazetteer(args.gazetteer))
+            else:
+                ano.set_gazetteer(analyzer.Gazetteer.from_csv(args.gazetteer))
+        if args.hash_key_file:
+            with open(args.hash_key_file, "rb") as f:
+                ano.set_hash_key(f.read().strip())
+        if args.fake_seed_file:
+            with open(args.fake_seed_file, "rb") as f:
+                ano.set_fake_seed(f.read().strip())
         for strat in strats:
             ano.add_analyzer(strat)
         if mask:
@@ -159,9 +217,24 @@ class AnonymiserCli:
             ano.set_annotator(annotator[0])
 
         if verbose:
-            print("Texte sans anonymisation : ", ano.text)
+            if not stream and not corpus:
+                print("Texte sans anonymisation : ", ano.text)
             print("strategies utilisées : ", strats)
-        if not annotator:
+        if stream:
+            ano.anonymize_file(input_file, output_file)
+        elif corpus:
+            names = sorted(name for name in os.listdir(input_file) if name.endswith(".txt"))
+            texts = (ano.open_text_file(os.path.join(input_file, name)) for name in names)
+            if annotator[0] == "doccano":
+                documents = ((text, None) for text in texts)
+                # comme pour un seul texte, le fichier est complété sauf avec --erase
+                ano.annotate_corpus(
+                    documents, output_file, resume=args.resume, append=not (erase or args.resume)
+                )
+            else:
+                documents = ((name[:-4], text, None) for name, text in zip(names, texts))
+                ano.annotate_to_directory(documents, output_file, format="json")
+        elif not annotator:
             anonymized_text = ano.anonymize(text=ano.text)
             output = open(output_file, "w")
             output.write(anonymized_text)
@@ -169,7 +242,7 @@ class AnonymiserCli:
 
         elif annotator[0] == "uimacas":
             print(annotator[0])
-            annotated_text: Cas = ano.annotate(text=ano.text)
+            annotated_text = ano.annotate(text=ano.text)
             print(annotated_text)
             annotated_text.to_json(path=output_file)
 
@@ -189,7 +262,9 @@ class AnonymiserCli:
                 output.write(annotated_text)
                 output.close()
         if verbose:
-            if not annotator:
+            if stream:
+                print("Texte anonymisé par fenêtres.")
+            elif not annotator:
                 print("Texte anonymisé : ", anonymized_text)
             else:
                 print("Votre texte est bien annoté.")
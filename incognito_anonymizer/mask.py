@@ -1,18 +1,358 @@
-from typing import Dict, List, Tuple
+import hashlib
+import os
+import re
+import unicodedata
+from array import array
+from bisect import bisect_right
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, TextIO, Tuple, Union
 """
     Classes to mask the word at the given coordinates
 """
 
 
+class OffsetMap:
+    """
+    Where the replaced spans are in the original text and in the masked
+    text, as sorted arrays: span i is source_starts[i]:source_ends[i] in
+    the original and target_starts[i]:target_ends[i] in the output.
+    Outside of them the two texts are the same, shifted by the difference
+    of length of the spans before.
+
+    A position is translated in either direction by a binary search.
+
+    Example :
+    >>> offsets = OffsetMap()
+    >>> PlaceholderStrategy().mask("Bob et Alice", {((0, 3), (7, 12)): "<NAME>"}, offsets=offsets)
+    '<NAME> et <NAME>'
+    >>> offsets.to_target(4), offsets.to_source(10)
+    (7, 7)
+    """
+
+    __slots__ = ("source_starts", "source_ends", "target_starts", "target_ends")
+
+    def __init__(self):
+        self.source_starts = array("q")
+        self.source_ends = array("q")
+        self.target_starts = array("q")
+        self.target_ends = array("q")
+
+    def add(self, source_start: int, source_end: int, target_start: int, target_end: int):
+        """Add a replaced span, after the others."""
+        self.source_starts.append(source_start)
+        self.source_ends.append(source_end)
+        self.target_starts.append(target_start)
+        self.target_ends.append(target_end)
+
+    def __len__(self) -> int:
+        return len(self.source_starts)
+
+    def __iter__(self):
+        """(source_start, source_end, target_start, target_end) of the spans."""
+        return zip(self.source_starts, self.source_ends, self.target_starts, self.target_ends)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, OffsetMap):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"OffsetMap({list(self)!r})"
+
+    @staticmethod
+    def _translate(position, starts, ends, other_starts, other_ends) -> int:
+        index = bisect_right(starts, position) - 1
+        if index < 0:
+            return position
+        if position >= ends[index]:
+            return position - ends[index] + other_ends[index]
+        # dans un span remplacé : son début, sauf pour le début lui-même
+        return other_starts[index]
+
+    def to_target(self, position: int) -> int:
+        """
+        Position in the masked text of a position of the original text. A
+        position inside a replaced span goes to the start of its replacement.
+        """
+        return self._translate(
+            position, self.source_starts, self.source_ends, self.target_starts, self.target_ends
+        )
+
+    def to_source(self, position: int) -> int:
+        """
+        Position in the original text of a position of the masked text. A
+        position inside a replacement goes to the start of the replaced span.
+        """
+        return self._translate(
+            position, self.target_starts, self.target_ends, self.source_starts, self.source_ends
+        )
+
+    def compose(self, other: "OffsetMap") -> "OffsetMap":
+        """
+        Map of a text masked by `self`, then by `other`.
+
+        :param other: map of the second masking, on the output of `self`
+        :returns: map from the original text to the output of `other`
+        """
+        # les spans des deux maps en coordonnées du texte d'origine et du
+        # texte final, puis fusion de ceux qui se chevauchent
+        spans = [
+            (start, end, other.to_target(target_start), other._end_to_target(target_end))
+            for start, end, target_start, target_end in self
+        ]
+        spans.extend(
+            (self.to_source(start), self._end_to_source(end), target_start, target_end)
+            for start, end, target_start, target_end in other
+        )
+        spans.sort()
+        composed = OffsetMap()
+        for span in spans:
+            if composed and span[0] < composed.source_ends[-1]:
+                composed.source_ends[-1] = max(composed.source_ends[-1], span[1])
+                composed.target_ends[-1] = max(composed.target_ends[-1], span[3])
+            else:
+                composed.add(*span)
+        return composed
+
+    def _end_to_target(self, position: int) -> int:
+        """Same as `to_target`, a position inside a span goes to the end of its replacement."""
+        index = bisect_right(self.source_starts, position - 1) - 1
+        if index >= 0 and position < self.source_ends[index]:
+            return self.target_ends[index]
+        return self.to_target(position)
+
+    def _end_to_source(self, position: int) -> int:
+        """Same as `to_source`, a position inside a replacement goes to the end of its span."""
+        index = bisect_right(self.target_starts, position - 1) - 1
+        if index >= 0 and position < self.target_ends[index]:
+            return self.source_ends[index]
+        return self.to_source(position)
+
+
+def render(
+    text: str,
+    coordinate: Dict[List[Tuple], str],
+    replace: Callable[[str, str], str],
+    stream: Optional[TextIO] = None,
+    offsets: Optional[OffsetMap] = None,
+) -> Optional[str]:
+    """
+    Replace the words at the given coordinates in a single pass over the
+    text: the spans are sorted once and the output is made of the slices
+    of text between them and of their replacements.
+
+    Overlapping spans are replaced as one, with the placeholder of the
+    first (longest on ties) of them.
+
+    :param text: text to anonymize
+    :param coordinate: position and placehoder of the words to replace
+    :param replace: function (word, placeholder) -> replacement
+    :param stream: optional text stream the output is written to
+    :param offsets: optional OffsetMap the replaced spans are added to
+    :returns: anonymized text, None when written to `stream`
+
+    Example :
+    >>> render("Bob et Alice", {((0, 3), (7, 12)): "<NAME>"}, lambda word, repl: repl)
+    '<NAME> et <NAME>'
+    """
+    spans = sorted(
+        ((start, end, repl) for positions, repl in coordinate.items() for start, end in positions),
+        key=lambda span: (span[0], -span[1]),
+    )
+    pieces = []
+    write = stream.write if stream is not None else pieces.append
+    position = 0
+    # décalage entre le texte masqué et le texte d'origine
+    shift = 0
+    index = 0
+    while index < len(spans):
+        start, end, repl = spans[index]
+        index += 1
+        # spans qui chevauchent celui-ci : remplacés avec lui
+        while index < len(spans) and spans[index][0] < end:
+            end = max(end, spans[index][1])
+            index += 1
+        if start < position:
+            start = position
+        replacement = replace(text[start:end], repl)
+        write(text[position:start])
+        write(replacement)
+        if offsets is not None:
+            offsets.add(start, end, start + shift, start + shift + len(replacement))
+            shift += len(replacement) - (end - start)
+        position = max(position, end)
+    write(text[position:])
+    if stream is None:
+        return "".join(pieces)
+    return None
+
+
 class Strategy:
     def mask(text, coordinate: Dict[List[Tuple], str]):
         raise NotImplementedError()
 
+    def replacement(self, word: str, placeholder: str) -> str:
+        """
+        Replacement of a word found by an analyzer.
+
+        :param word: original word
+        :param placeholder: placeholder given by the analyzer, e.g. <NAME>
+        """
+        raise NotImplementedError()
+
+
+# réserves de substituts, chargées une fois à l'import
+FIRST_NAMES = (
+    "Adèle", "Adrien", "Agathe", "Agnès", "Alain", "Albert", "Alexandre", "Alexis",
+    "Alice", "Aline", "Alix", "Amandine", "Amélie", "Anaïs", "Anatole", "André",
+    "Angèle", "Annabelle", "Anne", "Annick", "Antoine", "Armand", "Arnaud", "Arthur",
+    "Audrey", "Augustin", "Aurélie", "Aurore", "Axel", "Baptiste", "Basile", "Béatrice",
+    "Benjamin", "Benoît", "Bernadette", "Bernard", "Blanche", "Brigitte", "Bruno",
+    "Camille", "Capucine", "Carole", "Caroline", "Catherine", "Cécile", "Céline",
+    "Chantal", "Charles", "Charlotte", "Christian", "Christine", "Christophe", "Claire",
+    "Clara", "Claude", "Clémence", "Clément", "Colette", "Coline", "Constance",
+    "Corentin", "Cyril", "Damien", "Daniel", "Danielle", "Denis", "Denise", "Didier",
+    "Dominique", "Dorian", "Édith", "Édouard", "Éléonore", "Éliane", "Élise", "Élodie",
+    "Éloïse", "Émile", "Émilie", "Emma", "Enora", "Éric", "Erwan", "Estelle", "Étienne",
+    "Eugène", "Eva", "Évelyne", "Fabien", "Fabienne", "Fanny", "Félix", "Florence",
+    "Florian", "Francis", "Franck", "François", "Françoise", "Frédéric", "Gabriel",
+    "Gabrielle", "Gaël", "Gaëlle", "Gaspard", "Geneviève", "Georges", "Gérard",
+    "Ghislaine", "Gilbert", "Gilles", "Ginette", "Gisèle", "Goulven", "Grégoire",
+    "Guillaume", "Gustave", "Gwenaëlle", "Hélène", "Henri", "Hervé", "Hugo", "Hugues",
+    "Inès", "Irène", "Isabelle", "Jacqueline", "Jacques", "Jean", "Jeanne", "Jérôme",
+    "Joël", "Joëlle", "Josette", "Josiane", "Jules", "Julia", "Julie", "Julien",
+    "Juliette", "Justine", "Karine", "Katell", "Laetitia", "Laure", "Laurence", "Léa",
+    "Léo", "Léon", "Léonie", "Lionel", "Loïc", "Louis", "Louise", "Luc", "Lucas",
+    "Lucie", "Lucien", "Lucienne", "Ludovic", "Madeleine", "Maël", "Manon", "Marc",
+    "Marcel", "Marcelle", "Margaux", "Marguerite", "Marianne", "Marie", "Marine",
+    "Marion", "Marius", "Marthe", "Mathias", "Mathilde", "Matthieu", "Maurice",
+    "Maxime", "Mélanie", "Michel", "Michèle", "Mireille", "Monique", "Morgane",
+    "Muriel", "Nadine", "Nathalie", "Nicolas", "Noël", "Noémie", "Nolwenn", "Océane",
+    "Odette", "Odile", "Olivier", "Pascal", "Pascale", "Patrice", "Patricia", "Paul",
+    "Pauline", "Philippe", "Pierre", "Pierrick", "Quentin", "Rachel", "Raphaël",
+    "Raymond", "Rémi", "Renaud", "René", "Renée", "Roger", "Rolande", "Romain", "Ronan",
+    "Rose", "Rozenn", "Sabine", "Samuel", "Sandrine", "Sébastien", "Serge", "Simone",
+    "Soizic", "Solange", "Sophie", "Stéphane", "Suzanne", "Sylvain", "Sylvie", "Théo",
+    "Thérèse", "Thibault", "Thomas", "Tristan", "Valentin", "Valérie", "Véronique",
+    "Victoire", "Victor", "Vivien", "Xavier", "Yann", "Yannick", "Yolande", "Yves",
+    "Yvette", "Yvonne", "Zoé",
+)
+LAST_NAMES = (
+    "Abgrall", "Allain", "Andrieu", "Arnould", "Astier", "Aubert", "Aubin", "Aubry",
+    "Auger", "Bailly", "Barbe", "Barbier", "Barbot", "Baron", "Barre", "Barthélemy",
+    "Baudin", "Baudry", "Bazin", "Beaufils", "Bellanger", "Benard", "Benoist", "Bérard",
+    "Berger", "Bernier", "Berthelot", "Bertin", "Bertrand", "Besnard", "Besse",
+    "Besson", "Bignon", "Bigot", "Billard", "Bisson", "Blanc", "Blanchard", "Blin",
+    "Blondel", "Bodin", "Boisson", "Bonneau", "Bonnet", "Bouchard", "Boucher",
+    "Bouchet", "Boulanger", "Boulay", "Bourdon", "Bourgeois", "Bousquet", "Bouvet",
+    "Bouvier", "Boyer", "Brault", "Breton", "Briand", "Brochard", "Brossard", "Brun",
+    "Bruneau", "Brunet", "Buisson", "Caillaud", "Camus", "Carlier", "Caron",
+    "Carpentier", "Carré", "Cartier", "Chambon", "Chapuis", "Charpentier", "Charrier",
+    "Chartier", "Chatelain", "Chauveau", "Chauvin", "Chevalier", "Chevallier",
+    "Chevrier", "Clavel", "Clerc", "Cloarec", "Colas", "Colin", "Collet", "Collin",
+    "Combes", "Cordier", "Cornu", "Cosson", "Costa", "Coste", "Coulon", "Courtin",
+    "Courtois", "Cousin", "Couturier", "Delattre", "Delaunay", "Delmas", "Delorme",
+    "Deniau", "Desbois", "Deschamps", "Desjardins", "Devaux", "Dubois", "Dufour",
+    "Dumas", "Dumont", "Dumoulin", "Dupont", "Duprat", "Dupré", "Dupuis", "Durand",
+    "Duret", "Duval", "Ferrand", "Ferré", "Ferry", "Fleury", "Fontaine", "Forestier",
+    "Fortin", "Foucher", "Fouquet", "Fournier", "Gaillard", "Gallet", "Garcia",
+    "Garnier", "Gaudin", "Gauthier", "Gautier", "Geffroy", "Germain", "Gillet",
+    "Girard", "Giraud", "Godard", "Gomez", "Gosselin", "Goujon", "Gouriou", "Grandjean",
+    "Granger", "Grenier", "Grosjean", "Guégan", "Guérin", "Guillemin", "Guillot",
+    "Guillou", "Guyot", "Hamel", "Hamon", "Hardy", "Hébert", "Hoarau", "Huet",
+    "Humbert", "Imbert", "Jacob", "Jacquet", "Jacquot", "Jaouen", "Jégou", "Joly",
+    "Josse", "Jourdan", "Kerbrat", "Kerjean", "Klein", "Labbé", "Lacombe", "Lacroix",
+    "Lagarde", "Lambert", "Lamy", "Langlois", "Laporte", "Leblanc", "Lebon", "Lebreton",
+    "Lebrun", "Leclerc", "Leclercq", "Lecomte", "Lefèbvre", "Lefèvre", "Lefort",
+    "Legrand", "Legros", "Lejeune", "Lelièvre", "Lemaire", "Lemoine", "Lenoir",
+    "Lepage", "Leroux", "Leroy", "Lesage", "Letellier", "Lévêque", "Loiseau", "Lombard",
+    "Lopez", "Maillard", "Mallet", "Marchal", "Marchand", "Maréchal", "Martin",
+    "Martinez", "Marty", "Masson", "Maurin", "Maury", "Menard", "Mercier", "Meunier",
+    "Meyer", "Michaud", "Mignot", "Millet", "Monnier", "Moreau", "Morel", "Morin",
+    "Morvan", "Moulin", "Muller", "Naudin", "Navarro", "Nedelec", "Paris", "Pasquier",
+    "Pelletier", "Perret", "Perrier", "Perrin", "Perrot", "Petit", "Picard", "Pichon",
+    "Pineau", "Pinel", "Poirier", "Pottier", "Poulain", "Prévost", "Prigent", "Pruvost",
+    "Quéméner", "Raynaud", "Renard", "Renault", "Rey", "Riou", "Rivière", "Robin",
+    "Roche", "Rocher", "Rodriguez", "Rolland", "Rossignol", "Rousseau", "Roussel",
+    "Rouxel", "Roy", "Royer", "Sabatier", "Salaün", "Samson", "Sauvage", "Schmitt",
+    "Schneider", "Sellier", "Tanguy", "Tardy", "Tessier", "Texier", "Thépaut",
+    "Tournier", "Vallet", "Vannier", "Vasseur", "Verdier", "Viard", "Vidal", "Vigneron",
+    "Voisin", "Wagner", "Weber",
+)
+STREETS = (
+    "rue des Acacias", "rue de la Gare", "rue du Moulin", "rue Pasteur", "rue Victor Hugo",
+    "avenue de la République", "avenue des Tilleuls", "boulevard Voltaire",
+    "chemin des Prés", "impasse des Mésanges", "place de l'Église", "allée des Chênes",
+)
+DOMAINS = ("exemple.fr", "exemple.com", "exemple.org", "courriel.fr")
+MONTHS = (
+    "janvier", "février", "mars", "avril", "mai", "juin",
+    "juillet", "août", "septembre", "octobre", "novembre", "décembre",
+)
+
+_DATE_NUMERIC = re.compile(r"(\d{1,2})([/\-. :])(\d{1,2})\2(\d{4}|\d{2})")
+_DATE_ISO = re.compile(r"(\d{4})([/\-.])(\d{1,2})\2(\d{1,2})")
+_DATE_LITTERAL = re.compile(
+    rf"(?:(\d{{1,2}}|1er)(\s+))?({'|'.join(MONTHS)})(?:(\s+)(\d{{4}}))?", re.IGNORECASE
+)
+_ALNUM = re.compile(r"[^\W_]")
+_DIGITS = re.compile(r"\d+")
+_WORDS = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+_TOKENS = re.compile(r"[^\W_]+")
+# mots sans information sur la personne, qu'un substitut peut reprendre
+_FILLERS = frozenset((
+    "rue", "avenue", "boulevard", "chemin", "impasse", "place", "allée",
+    "de", "du", "des", "la", "le", "l", "d", "fr", "com", "org",
+))
+
+
+def _fold(word: str) -> str:
+    """Word without accents nor case, to compare names."""
+    decomposed = unicodedata.normalize("NFKD", word)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+# un mot de ces prénoms est un prénom, quelle que soit sa casse
+_GIVEN_NAMES = frozenset(map(_fold, FIRST_NAMES))
+
 
 class FakeStrategy(Strategy):
-    """Replace word by natural placeholder"""
+    """
+    Replace word by natural placeholder : a surrogate drawn from the pools
+    above (names, streets, e-mails), dates shifted by a number of days
+    proper to each patient, digits of numbers replaced by other digits.
 
-    def __init__(self):
+    The surrogate only depends on the word, its placeholder, the seed and
+    the patient date shift, so repeated mentions get the same surrogate
+    in every document masked with the same seed. A word of `FIRST_NAMES`
+    gets a first name whatever its case, any other word a last name.
+    Different words can get the same surrogate, one name in a few hundred.
+    Every word and number of a span is replaced; when a surrogate would
+    keep one of them (or keep a date unchanged), the fixed placeholder of
+    the type is used instead.
+
+    :param seed: secret of the draws. Without seed the surrogates are off
+        and every word of a type is replaced by the same placeholder, e.g.
+        every name by "Margaret Hamilton"
+    :param cache_size: number of surrogates kept
+    :param max_shift: dates are shifted by 1 to `max_shift` days, forward
+        or backward
+    :param surrogates: False to keep the fixed placeholders even with a
+        seed, default to True when there is a seed
+    :param id_field: PersonalInfo field identifying a patient, the date
+        shift of a PersonalInfo is the one of this ID
+    :raises ValueError: if surrogates are asked without seed
+    """
+
+    def __init__(
+        self,
+        seed: Union[bytes, str, None] = None,
+        cache_size: int = 65536,
+        max_shift: int = 365,
+        surrogates: Optional[bool] = None,
+        id_field: str = "ipp",
+    ):
         self.natural_placehodler = {
             "<PER>": "Margaret Hamilton",
             "<NAME>": "Margaret Hamilton",
@@ -25,13 +365,227 @@ class FakeStrategy(Strategy):
             "<ADRESSE>": "35 Rue Margaret Hamilton",
             "<NUMBER>": "123456789"
         }
+        self.cache_size = cache_size
+        self.max_shift = max_shift
+        self.id_field = id_field
+        self.generators = {
+            "<PER>": self._name,
+            "<NAME>": self._name,
+            "<DATE>": self._date,
+            "<EMAIL>": self._email,
+            "<ADRESSE>": self._adress,
+            "<CODE_POSTAL>": self._code,
+            "<IPP>": self._code,
+            "<IEP>": self._code,
+            "<NIR>": self._code,
+            "<PHONE>": self._code,
+            "<NUMBER>": self._code,
+        }
+        if surrogates and seed is None:
+            # sans graine fixée, deux exécutions donneraient d'autres substituts
+            raise ValueError("surrogates need a seed")
+        self.seed = seed
+        self.surrogates = seed is not None if surrogates is None else surrogates
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # les caches ne sont pas picklables, ils sont refaits par __setstate__
+        del state["_surrogate"], state["_date_shift"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_caches()
+
+    @property
+    def seed(self) -> Optional[bytes]:
+        return self._seed
+
+    @seed.setter
+    def seed(self, seed: Union[bytes, str, None]):
+        if isinstance(seed, str):
+            seed = seed.encode("utf-8")
+        if seed is not None:
+            seed = hashlib.blake2b(seed, digest_size=32).digest()
+        self._seed = seed
+        # les substituts tirés avec l'ancienne graine ne sont plus valables
+        self._build_caches()
 
-    def mask(self, text: str, coordinate: Dict[List[Tuple], str]) -> str:
+    def _build_caches(self):
+        """Surrogate and date shift functions of the current seed, behind LRU caches."""
+        if self.cache_size > 0:
+            self._surrogate = lru_cache(maxsize=self.cache_size)(self.surrogate)
+            self._date_shift = lru_cache(maxsize=self.cache_size)(self._patient_shift)
+        else:
+            self._surrogate = self.surrogate
+            self._date_shift = self._patient_shift
+
+    def _draw_bytes(self, word: str, size: int = 8) -> bytes:
+        """`size` bytes drawn from a word, the same for the same seed."""
+        if self._seed is None:
+            raise ValueError("surrogates need a seed")
+        return hashlib.blake2b(word.encode("utf-8"), key=self._seed, digest_size=size).digest()
+
+    def _draw(self, word: str) -> int:
+        """64 bits number drawn from a word, the same for the same seed."""
+        return int.from_bytes(self._draw_bytes(word), "little")
+
+    def date_shift(self, infos=None) -> int:
+        """
+        Number of days the dates of a patient are shifted by, never 0.
+
+        :param infos: PersonalInfo or ID of the patient, None for the dates
+            of documents without patient. A PersonalInfo with an `id_field`
+            gets the shift of its ID, as a patient of a PatientRegistry
+        """
+        if infos is None:
+            return self._date_shift(())
+        if isinstance(infos, str):
+            return self._date_shift((infos,))
+        patient_id = getattr(infos, self.id_field, "")
+        if patient_id:
+            return self._date_shift((patient_id,))
+        return self._date_shift(tuple(vars(infos).values()))
+
+    def _patient_shift(self, patient: tuple) -> int:
+        draw = self._draw(repr(patient))
+        shift = draw % self.max_shift + 1
+        return shift if draw >> 32 & 1 else -shift
+
+    def surrogate(self, word: str, placeholder: str, shift: int = 0) -> str:
+        """
+        Surrogate of a word.
+
+        :param word: original word
+        :param placeholder: placeholder given by the analyzer, e.g. <NAME>
+        :param shift: days added to the dates
+        :returns: surrogate, the natural placeholder if it can't be drawn
+        """
+        generator = self.generators.get(placeholder)
+        surrogate = generator(word, shift) if generator is not None else None
+        if surrogate is None or _leaks(word, surrogate, placeholder == "<DATE>"):
+            return self.natural_placehodler.get(placeholder, placeholder)
+        return surrogate
+
+    def _name_part(self, part: str) -> str:
+        draw = self._draw(part.lower())
+        if len(part) == 1:
+            pool = "ABCDEFGHIJKLMNOPRSTV"
+        elif all(_fold(name) in _GIVEN_NAMES for name in re.split(r"['’-]", part)):
+            # "JEAN", "jean" et "Jean-Pierre" sont des prénoms
+            pool = FIRST_NAMES
+        else:
+            pool = LAST_NAMES
+        # jamais le mot lui-même, "Alice" est aussi dans les réserves
+        surrogate = pool[draw % len(pool)]
+        if surrogate.lower() == part.lower():
+            surrogate = pool[(draw + 1) % len(pool)]
+        if part.isupper():
+            return surrogate.upper()
+        if part.islower():
+            return surrogate.lower()
+        return surrogate
+
+    def _name(self, word: str, shift: int) -> str:
+        # chaque mot remplacé à part, quelle que soit sa casse : DUPONT a
+        # le même substitut dans "Jean DUPONT" et "M. DUPONT"
+        surrogate = _WORDS.sub(lambda match: self._name_part(match[0]), word)
+        return _DIGITS.sub(lambda match: self._code(match[0], shift), surrogate)
+
+    def _email(self, word: str, shift: int) -> str:
+        draw = self._draw(word.lower())
+        first = FIRST_NAMES[draw % len(FIRST_NAMES)]
+        last = LAST_NAMES[draw // len(FIRST_NAMES) % len(LAST_NAMES)]
+        domain = DOMAINS[draw >> 32 & 3]
+        return f"{first}.{last}@{domain}".lower()
+
+    def _adress(self, word: str, shift: int) -> str:
+        draw = self._draw(word.lower())
+        return f"{draw % 150 + 1} {STREETS[(draw >> 16) % len(STREETS)]}"
+
+    def _code(self, word: str, shift: int) -> str:
+        # chiffres et lettres tirés à nouveau, séparateurs gardés : un
+        # identifiant sans chiffre ("AB-CD") est aussi remplacé
+        draws = self._draw_bytes(word, 32)
+        position = -1
+
+        def character(match):
+            nonlocal position
+            position += 1
+            draw = draws[position % 32]
+            char = match[0]
+            if char.isdigit():
+                return str(draw % 10)
+            letter = chr(ord("A") + draw % 26)
+            return letter if char.isupper() else letter.lower()
+
+        return _ALNUM.sub(character, word)
+
+    def _date(self, word: str, shift: int) -> Optional[str]:
+        match = _DATE_ISO.fullmatch(word)
+        if match:
+            year, sep, month, day = match.groups()
+            shifted = _shift(int(year), int(month), int(day), shift)
+            if shifted is None:
+                return None
+            return f"{shifted.year:04d}{sep}{shifted.month:0{len(month)}d}{sep}{shifted.day:0{len(day)}d}"
+        match = _DATE_NUMERIC.fullmatch(word)
+        if match:
+            day, sep, month, year = match.groups()
+            shifted = _shift(_full_year(year), int(month), int(day), shift)
+            if shifted is None:
+                # format américain des mots-clés PII
+                day, month = month, day
+                shifted = _shift(_full_year(year), int(month), int(day), shift)
+            if shifted is None:
+                return None
+            return (
+                f"{shifted.day:0{len(day)}d}{sep}{shifted.month:0{len(month)}d}{sep}"
+                f"{shifted.year % 10 ** len(year):0{len(year)}d}"
+            )
+        match = _DATE_LITTERAL.fullmatch(word)
+        if match:
+            day, space, month, year_space, year = match.groups()
+            # sans année, une année bissextile accepte le 29 février ;
+            # sans jour, le mois est décalé depuis son milieu
+            shifted = _shift(
+                int(year) if year else 2000,
+                MONTHS.index(month.lower()) + 1,
+                15 if day is None else 1 if day == "1er" else int(day),
+                shift,
+            )
+            if shifted is None:
+                return None
+            surrogate = MONTHS[shifted.month - 1]
+            if day is not None:
+                day = "1er" if shifted.day == 1 and day == "1er" else str(shifted.day)
+                surrogate = f"{day}{space}{surrogate}"
+            if year:
+                surrogate = f"{surrogate}{year_space}{shifted.year}"
+            return surrogate
+        return None
+
+    def replacement(self, word: str, placeholder: str, shift: int = 0) -> str:
+        if not self.surrogates:
+            return self.natural_placehodler.get(placeholder, placeholder)
+        return self._surrogate(word, placeholder, shift)
+
+    def mask(
+        self,
+        text: str,
+        coordinate: Dict[List[Tuple], str],
+        stream: Optional[TextIO] = None,
+        infos=None,
+        offsets: Optional[OffsetMap] = None,
+    ) -> str:
         """
         Replace in text, words at the given coordinates by a natural palceholder.
 
         :param test: text to anonymize
         :param coordinate: position and placehoder of the word to replace
+        :param stream: optional text stream the output is written to
+        :param infos: PersonalInfo of the patient, sets the date shift
+        :param offsets: optional OffsetMap the replaced spans are added to
         :returns: anonymzed text
 
         Example :
@@ -40,27 +594,73 @@ class FakeStrategy(Strategy):
         >>> coordinate = {((0,3),): '<NAME>',}
         >>> anonymizer.mask(text, coordinate)
         'Margaret Hamilton'
+        >>> anonymizer = FakeStrategy(seed="secret")
+        >>> text = "Alice et Alice"
+        >>> coordinate = {((0,5), (9,14)): '<NAME>',}
+        >>> anonymizer.mask(text, coordinate)
+        'Léonie et Léonie'
         """
-        text_as_list = list(text)
-        all_positions = []
-        for spans, repl in coordinate.items():
-            repl = self.natural_placehodler[repl]
-            all_positions.extend((start, end, repl) for start, end in spans)
+        if not self.surrogates:
+            return render(text, coordinate, self.replacement, stream, offsets)
+        shift = self.date_shift(infos)
+        surrogate = self._surrogate
+        return render(
+            text,
+            coordinate,
+            lambda word, placeholder: surrogate(word, placeholder, shift),
+            stream,
+            offsets,
+        )
+
+
+def _leaks(word: str, surrogate: str, whole: bool = False) -> bool:
+    """
+    True if `surrogate` keeps a word or number of `word`, except the
+    fillers. With `whole`, only the surrogate equal to `word` leaks: a
+    shifted date can keep its month or year.
+    """
+    if whole:
+        return surrogate.casefold() == word.casefold()
+    kept = {token.casefold() for token in _TOKENS.findall(surrogate)}
+    return any(
+        token.casefold() in kept and token.casefold() not in _FILLERS
+        for token in _TOKENS.findall(word)
+    )
+
 
-        all_positions.sort(key=lambda x: x[0], reverse=True)
-        for start, end, repl in all_positions:
-            text_as_list[start:end] = list(repl)
-        return "".join(text_as_list)
+def _full_year(year: str) -> int:
+    if len(year) == 4:
+        return int(year)
+    return 2000 + int(year) if int(year) < 50 else 1900 + int(year)
+
+
+def _shift(year: int, month: int, day: int, shift: int) -> Optional[date]:
+    """Date shifted by `shift` days, None if it doesn't exist."""
+    try:
+        return date(year, month, day) + timedelta(days=shift)
+    except (ValueError, OverflowError):
+        return None
 
 
 class PlaceholderStrategy(Strategy):
     """Replace by placeholders"""
 
-    def mask(self, text, coordinate: Dict[List[Tuple], str]) -> str:
+    def replacement(self, word: str, placeholder: str) -> str:
+        return placeholder
+
+    def mask(
+        self,
+        text,
+        coordinate: Dict[List[Tuple], str],
+        stream: Optional[TextIO] = None,
+        offsets: Optional[OffsetMap] = None,
+    ) -> str:
         """
         Replace in text, words at the given coordinates by a placeholder.
         :param test: text to anonymize
         :param coordinate: position and placehoder of the word to replace
+        :param stream: optional text stream the output is written to
+        :param offsets: optional OffsetMap the replaced spans are added to
         :returns: anonymzed text
 
         Example :
@@ -71,27 +671,28 @@ class PlaceholderStrategy(Strategy):
         '<NAME>'
 
         """
-        text_as_list = list(text)
-
-        all_positions = []
-        for spans, repl in coordinate.items():
-            all_positions.extend((start, end, repl) for start, end in spans)
-
-        all_positions.sort(key=lambda x: x[0], reverse=True)
-        for start, end, repl in all_positions:
-
-            text_as_list[start:end] = list(repl)
-        return "".join(text_as_list)
+        return render(text, coordinate, self.replacement, stream, offsets)
 
 
 class HideStrategy(Strategy):
     """Replace by *"""
 
-    def mask(self, text, coordinate: Dict[List[Tuple], str]) -> str:
+    def replacement(self, word: str, placeholder: str) -> str:
+        return "*" * (8 if len(word) < 5 else len(word))
+
+    def mask(
+        self,
+        text,
+        coordinate: Dict[List[Tuple], str],
+        stream: Optional[TextIO] = None,
+        offsets: Optional[OffsetMap] = None,
+    ) -> str:
         """
         Replace in text, words at the given coordinates by *.
         :param test: text to anonymize
         :param coordinate: position and placehoder of the word to replace
+        :param stream: optional text stream the output is written to
+        :param offsets: optional OffsetMap the replaced spans are added to
         :returns: anonymzed text
 
         Example :
@@ -102,22 +703,138 @@ class HideStrategy(Strategy):
         '********'
 
         """
-        text_as_list = list(text)
+        return render(text, coordinate, self.replacement, stream, offsets)
 
-        all_positions = []
-        for spans, repl in coordinate.items():
-            all_positions.extend((start, end, repl) for start, end in spans)
 
-        all_positions.sort(key=lambda x: x[0], reverse=True)
-        for start, end, repl in all_positions:
-            word_len = end - start
-            replacement = "*" * (8 if word_len < 5 else word_len)
-            text_as_list[start:end] = list(replacement)
-        return "".join(text_as_list)
+class HashStrategy(Strategy):
+    """
+    Replace les mots par leur hash : keyed blake2b of the word, so a same
+    word gets the same token in every document masked with the same key.
 
+    :param key: secret key, at most 64 bytes. Without key, a random one is
+        drawn: tokens are then only linkable within this instance (and the
+        workers it is sent to)
+    :param digest_size: size of the hash in bytes, the token shows it in
+        hex. With 8 bytes, two of 100 millions words share a token with a
+        probability under 0.03%, 4 bytes give about 116 collisions for 1
+        million words
+    :param cache_size: number of words whose hash is kept
+    """
 
-class HashStrategy(Strategy):
-    """Replace les mots par leur hash"""
+    def __init__(
+        self,
+        key: Union[bytes, str, None] = None,
+        digest_size: int = 8,
+        cache_size: int = 65536,
+    ):
+        self.digest_size = digest_size
+        self.cache_size = cache_size
+        self.key = key
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # le cache n'est pas picklable, il est refait par __setstate__
+        del state["_digest"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._digest = self._build_digest()
+
+    @property
+    def key(self) -> bytes:
+        return self._key
+
+    @key.setter
+    def key(self, key: Union[bytes, str, None]):
+        if key is None:
+            key = os.urandom(32)
+        elif isinstance(key, str):
+            key = key.encode("utf-8")
+        if len(key) > hashlib.blake2b.MAX_KEY_SIZE:
+            raise ValueError(
+                f"hash key is {len(key)} bytes, at most {hashlib.blake2b.MAX_KEY_SIZE} are allowed"
+            )
+        self._key = key
+        # les hash calculés avec l'ancienne clé ne sont plus valables
+        self._digest = self._build_digest()
+
+    def _build_digest(self) -> Callable[[str], str]:
+        """Hash function of the current key, behind a LRU cache."""
+        blake2b, key, digest_size = hashlib.blake2b, self._key, self.digest_size
+
+        def digest(word: str) -> str:
+            return blake2b(word.encode("utf-8"), key=key, digest_size=digest_size).hexdigest()
+
+        if self.cache_size > 0:
+            return lru_cache(maxsize=self.cache_size)(digest)
+        return digest
+
+    def digest(self, word: str) -> str:
+        """
+        Hex keyed hash of a word.
+
+        :param word: word to hash
+        :returns: hex digest, 2 * `digest_size` characters
+        """
+        return self._digest(word)
+
+    def digests(self, words: Iterable[str]) -> Dict[str, str]:
+        """
+        Hex keyed hash of several words, e.g. all the words masked in a
+        document, each distinct word is hashed once.
+
+        :param words: words to hash
+        :returns: dict word -> hex digest
+        """
+        digest = self._digest
+        return {word: digest(word) for word in set(words)}
+
+    def cache_info(self):
+        """Hits, misses and size of the cache of hashes."""
+        return self._digest.cache_info() if self.cache_size > 0 else None
+
+    @staticmethod
+    def token(placeholder: str, hex_digest: str) -> str:
+        """Token of a word: its placeholder with the hash, e.g. <NAME:1f0c9a3e5b7d2468>"""
+        return f"<{placeholder.strip('<>')}:{hex_digest}>"
+
+    def replacement(self, word: str, placeholder: str) -> str:
+        return self.token(placeholder, self.digest(word))
+
+    def mask(
+        self,
+        text,
+        coordinate: Dict[List[Tuple], str],
+        stream: Optional[TextIO] = None,
+        offsets: Optional[OffsetMap] = None,
+    ) -> str:
+        """
+        Replace in text, words at the given coordinates by their keyed hash.
+        All the words of the text are hashed at once.
+        :param test: text to anonymize
+        :param coordinate: position and placehoder of the word to replace
+        :param stream: optional text stream the output is written to
+        :param offsets: optional OffsetMap the replaced spans are added to
+        :returns: anonymzed text
+
+        Example :
+        >>> anonymizer = HashStrategy(key="secret")
+        >>> text = "Bob et Bob"
+        >>> coordinate = {((0,3), (7,10)): '<NAME>',}
+        >>> anonymizer.mask(text, coordinate)
+        '<NAME:326e2158bc709ddd> et <NAME:326e2158bc709ddd>'
+
+        """
+        digests = self.digests(
+            text[start:end] for positions in coordinate for start, end in positions
+        )
+
+        def replace(word: str, placeholder: str) -> str:
+            hex_digest = digests.get(word)
+            if hex_digest is None:
+                # union de spans qui se chevauchent
+                return self.replacement(word, placeholder)
+            return self.token(placeholder, hex_digest)
 
-    # TODO : blake256 8 digits et paper bourrin(20ene de bytes)
-    pass
+        return render(text, coordinate, replace, stream, offsets)
@@ -1,9 +1,18 @@
 from incognito_anonymizer import Anonymizer
 from incognito_anonymizer import DetectedEntity
+from incognito_anonymizer import EntityTable
 from incognito_anonymizer import analyzer
+from incognito_anonymizer import anotate
 from incognito_anonymizer import mask
 from incognito_anonymizer import PersonalInfo
-from datetime import datetime
+from datetime import datetime, timedelta
+import gzip
+import io
+import json
+import pickle
+import subprocess
+import sys
+import unicodedata
 import pytest
 
 dataset_regex = {
@@ -99,6 +108,7 @@ dataset_regex = {
 
 datas_regex = list(dataset_regex.values())
 ids_regex = list(dataset_regex.keys())
+differential_texts = [text for text, _ in datas_regex if text]
 
 
 @pytest.mark.parametrize("input,output", datas_regex, ids=ids_regex)
@@ -148,6 +158,288 @@ def test_mask_not_implemented_error():
         mask.Strategy.mask("test", coordinate=((10, 10), "<TEST>"))
 
 
+@pytest.mark.parametrize(
+    "strategy,output",
+    [
+        (mask.PlaceholderStrategy(), "<NAME> a écrit à <EMAIL> et <NAME>."),
+        (mask.HideStrategy(), "******** a écrit à ****************** et *****."),
+        (mask.FakeStrategy(), "Margaret Hamilton a écrit à place.holder@anonymization.cdc et Margaret Hamilton."),
+    ],
+)
+def test_mask_render(strategy, output):
+    text = "Bob a écrit à bob.dupont@mail.fr et Alice."
+    coordinate = {((0, 3), (36, 41)): "<NAME>", ((14, 32),): "<EMAIL>"}
+    assert strategy.mask(text, coordinate) == output
+    stream = io.StringIO()
+    assert strategy.mask(text, coordinate, stream=stream) is None
+    assert stream.getvalue() == output
+
+
+def test_mask_render_overlapping_spans():
+    # les spans qui se chevauchent sont remplacés une seule fois
+    text = "Jean Pierre DUPONT"
+    coordinate = {((0, 11),): "<NAME>", ((5, 18),): "<NAME>"}
+    assert mask.PlaceholderStrategy().mask(text, coordinate) == "<NAME>"
+
+
+def test_fake_surrogates():
+    strategy = mask.FakeStrategy(seed="secret", cache_size=2)
+    text = "Jean DUPONT né le 12/03/1980, DUPONT : 06 12 34 56 78, jean@chu.fr"
+
+    def at(word, start=0):
+        return (text.index(word, start), text.index(word, start) + len(word))
+
+    coordinate = {
+        (at("Jean DUPONT"), at("DUPONT", 20)): "<NAME>",
+        (at("12/03/1980"),): "<DATE>",
+        (at("06 12 34 56 78"),): "<PHONE>",
+        (at("jean@chu.fr"),): "<EMAIL>",
+    }
+    info = PersonalInfo(first_name="Jean", last_name="DUPONT")
+    output = strategy.mask(text, coordinate, infos=info)
+    first, last, _, _, date, repeated = output.split(" ")[:6]
+    assert first in mask.FIRST_NAMES
+    assert last in [name.upper() for name in mask.LAST_NAMES]
+    # DUPONT a le même substitut dans les deux mentions
+    assert repeated == last
+    shift = strategy.date_shift(info)
+    assert 1 <= abs(shift) <= strategy.max_shift
+    assert date == (datetime(1980, 3, 12) + timedelta(days=shift)).strftime("%d/%m/%Y,")
+    assert "06 12 34 56 78" not in output
+    assert "@" in output and "jean@chu.fr" not in output
+    # même graine, mêmes substituts
+    assert mask.FakeStrategy(seed="secret").mask(text, coordinate, infos=info) == output
+    assert pickle.loads(pickle.dumps(strategy)).mask(text, coordinate, infos=info) == output
+    # type sans générateur : le placeholder
+    assert strategy.mask("Bob", {((0, 3),): "<TEST>"}) == "<TEST>"
+    with pytest.raises(ValueError, match="surrogates need a seed"):
+        mask.FakeStrategy(surrogates=True)
+
+
+def test_fake_surrogates_replace_every_token():
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    ano.add_analyzer("pii")
+    ano.set_mask("fake")
+    infos = PersonalInfo(first_name="jean", last_name="dupont", ipp="AB-CD")
+    text = "le patient dupont jean, ipp AB-CD, vu le 12/03/2021 par le Docteur Alice DUBOIS, tél: 06 12 34 56 78."
+    # sans graine, les placeholders fixes : même sortie à chaque exécution
+    assert ano.anonymize(text, infos).startswith("le patient Margaret Hamilton Margaret Hamilton,")
+
+    ano.set_fake_seed("secret")
+    spans = ano._merge_spans([strategy.analyze(text=text, info=infos) for strategy in ano._analyzers])
+    words = [text[start:end] for positions in spans for start, end in positions]
+    assert {"dupont", "jean", "AB-CD", "Alice DUBOIS"} <= set(words)
+    for seed in ("secret", "other", "again"):
+        ano.set_fake_seed(seed)
+        output = ano.anonymize(text, infos)
+        for word in words:
+            assert word not in output
+        tokens = {token.lower() for token in mask._TOKENS.findall(output)}
+        assert not tokens & {"dupont", "jean", "ab", "cd", "alice", "dubois", "06", "12"}
+    # un substitut qui garderait un mot est remplacé par le placeholder
+    strategy = mask.FakeStrategy(seed="secret")
+    assert strategy.surrogate("06", "<PHONE>") != "06"
+    assert mask._leaks("12 rue Pasteur", "12 rue des Acacias")
+    assert not mask._leaks("3 rue Pasteur", "12 rue des Acacias")
+
+
+def test_fake_name_roles():
+    strategy = mask.FakeStrategy(seed="secret")
+    first_names = {name.upper() for name in mask.FIRST_NAMES}
+    last_names = {name.upper() for name in mask.LAST_NAMES}
+    # le rôle du mot choisit la réserve, pas sa casse
+    for word in ("Jean", "JEAN", "jean", "Hélène", "HELENE", "Jean-Pierre"):
+        assert strategy.surrogate(word, "<NAME>").upper() in first_names
+    for word in ("Dupont", "DUPONT", "dupont", "Abgrall"):
+        assert strategy.surrogate(word, "<NAME>").upper() in last_names
+    assert not first_names & last_names
+    surrogates = {strategy.surrogate(name, "<NAME>") for name in mask.LAST_NAMES}
+    assert len(surrogates) > len(mask.LAST_NAMES) / 2
+
+
+def test_fake_patient_shift():
+    registry = analyzer.PatientRegistry(
+        [{"ipp": "42", "first_name": "Jean", "last_name": "DUPONT", "birthdate": "1980-03-12"}]
+    )
+    strategy = mask.FakeStrategy(seed="secret")
+    # même décalage pour l'ID et la PersonalInfo du patient
+    assert strategy.date_shift(registry["42"]) == strategy.date_shift("42")
+    assert strategy.date_shift(PersonalInfo(ipp="42")) == strategy.date_shift("42")
+    assert strategy.date_shift(PersonalInfo(first_name="Jean")) != strategy.date_shift(
+        PersonalInfo(first_name="Marc")
+    )
+
+    ano = Anonymizer()
+    ano.add_analyzer("pii")
+    ano.set_fake_seed("secret")
+    ano.set_mask("fake")
+    ano.set_registry(registry)
+    text = "Jean DUPONT, né le 12/03/1980"
+    assert ano.anonymize(text, "42") == ano.anonymize(text, registry["42"])
+    ano.set_registry(analyzer.PatientRegistry([{"iep": "7", "ipp": "42"}], id_field="iep"))
+    assert ano.MASKS["fake"].id_field == "iep"
+
+
+def test_hash_strategy():
+    strategy = mask.HashStrategy(key="secret", cache_size=2)
+    text = "Bob a écrit à Alice et Bob."
+    coordinate = {((0, 3), (14, 19), (23, 26)): "<NAME>"}
+    output = strategy.mask(text, coordinate)
+    bob, alice = strategy.digest("Bob"), strategy.digest("Alice")
+    assert output == f"<NAME:{bob}> a écrit à <NAME:{alice}> et <NAME:{bob}>."
+    assert len(bob) == 16 and bob != alice
+    # même clé, même token ; autre clé, autre token
+    assert mask.HashStrategy(key=b"secret").digest("Bob") == bob
+    strategy.key = "other"
+    assert strategy.digest("Bob") != bob
+    assert strategy.digests(["a", "b", "a", "c"]) == {w: strategy.digest(w) for w in "abc"}
+    assert strategy.cache_info().currsize == 2
+    assert pickle.loads(pickle.dumps(strategy)).digest("Bob") == strategy.digest("Bob")
+    with pytest.raises(ValueError):
+        mask.HashStrategy(key=b"k" * 65)
+
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    ano.set_mask("hash")
+    ano.set_hash_key("secret")
+    assert ano.anonymize("Mail : bob@mail.fr") == ano.anonymize("Mail : bob@mail.fr")
+    assert ano.anonymize("Mail : bob@mail.fr").startswith("Mail : <EMAIL:")
+
+
+def test_lazy_registry():
+    ano = Anonymizer()
+    assert list(ano.ANALYZERS) == list(Anonymizer.ANALYZER_CLASSES)
+    assert not ano.ANALYZERS._instances and not ano.ANNOTATORS._instances
+    ano.add_analyzer("pii")
+    assert list(ano.ANALYZERS._instances) == ["pii"]
+    assert ano.ANALYZERS["pii"] is ano._analyzers[0]
+    assert "test" not in ano.ANALYZERS
+    # chaque Anonymizer a ses propres stratégies
+    assert Anonymizer().ANALYZERS["pii"] is not ano.ANALYZERS["pii"]
+
+
+def test_deferred_imports():
+    code = (
+        "import sys, incognito_anonymizer.cli; "
+        "print(' '.join(m for m in ('cassis', 'asyncio', 'multiprocessing') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.split() == []
+
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    ano.set_annotator("uimacas")
+    cas = ano.annotate("Dr DUPONT Jean")
+    assert [a.label for a in cas.select("custom.NamedEntity")] == ["<NAME>"]
+
+
+@pytest.mark.parametrize("name", ["corpus.jsonl", "corpus.jsonl.gz"])
+def test_annotate_corpus(name, tmp_path):
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    texts = [f"Dr DUPONT Jean, tél: 065156560{i}" for i in range(5)]
+    documents = [(text, None) for text in texts]
+    path = tmp_path / name
+    assert ano.annotate_corpus(documents, path, flush_every=2) == 5
+
+    def lines():
+        with (gzip.open if name.endswith(".gz") else open)(path, "rt", encoding="utf-8") as f:
+            return f.read().splitlines()
+
+    doccano = anotate.DoccanoStrategy()
+    expected = [doccano.annotate(text, ano.ANALYZERS["regex"].analyze(text)) for text in texts]
+    assert lines() == expected
+
+    # état du fichier à un arrêt brutal après le checkpoint du 2e document
+    with anotate.DoccanoWriter(path, flush_every=2) as writer:
+        for text in texts[:3]:
+            writer.write(text, {})
+        writer._raw.flush()
+        crashed, checkpoint = path.read_bytes(), (tmp_path / f"{name}.offset").read_text()
+    path.write_bytes(crashed)
+    (tmp_path / f"{name}.offset").write_text(checkpoint)
+    assert anotate.DoccanoWriter.read_checkpoint(f"{path}.offset")[0] == 2
+    assert ano.annotate_corpus(iter(documents), path, resume=True) == 5
+    assert lines()[:2] == [doccano.annotate(text, {}) for text in texts[:2]]
+    assert lines()[2:] == expected[2:]
+
+    # sans checkpoint, les enregistrements du fichier sont relus : seul le
+    # dernier, coupé par l'arrêt, est réécrit
+    written = lines()
+    (tmp_path / f"{name}.offset").unlink()
+    torn = b'{"text": "Dr DUPONT'
+    with open(path, "ab") as f:
+        f.write(gzip.compress(torn)[:-4] if name.endswith(".gz") else torn)
+    assert ano.annotate_corpus(iter(documents), path, resume=True) == 5
+    assert lines() == written
+    # ajout après les enregistrements du fichier, checkpoint à jour ou non
+    assert ano.annotate_corpus(documents[:2], path, append=True) == 7
+    (tmp_path / f"{name}.offset").unlink()
+    assert ano.annotate_corpus(documents[:1], path, append=True) == 8
+    assert lines() == written + expected[:2] + expected[:1]
+    assert ano.annotate_corpus(documents[:1], path) == 1
+
+    # un fichier qui n'est pas un corpus Doccano n'est jamais écrasé
+    other = tmp_path / f"other{name[6:]}"
+    content = "pas un corpus\n" + written[0] + "\n"
+    with (gzip.open if name.endswith(".gz") else open)(other, "wt", encoding="utf-8") as f:
+        f.write(content)
+    before = other.read_bytes()
+    for options in ({"resume": True}, {"append": True}):
+        with pytest.raises(ValueError, match="line 1 is not a Doccano record"):
+            ano.annotate_corpus(documents, other, **options)
+        assert other.read_bytes() == before
+
+
+def test_doccano_writer_append_separator(tmp_path):
+    # fichier écrit par le CLI, sans fin de ligne après le dernier texte
+    path = tmp_path / "annotations.jsonl"
+    doccano = anotate.DoccanoStrategy()
+    path.write_text("\n" + doccano.annotate("Bob", {((0, 3),): "<NAME>"}), encoding="utf-8")
+    with anotate.DoccanoWriter(path, append=True) as writer:
+        assert writer.documents == 1
+        writer.write("Alice", {((0, 5),): "<NAME>"})
+    assert path.read_text(encoding="utf-8").splitlines() == [
+        "",
+        doccano.annotate("Bob", {((0, 3),): "<NAME>"}),
+        doccano.annotate("Alice", {((0, 5),): "<NAME>"}),
+    ]
+    with anotate.DoccanoWriter(tmp_path / "new.jsonl", resume=True) as writer:
+        assert writer.documents == 0
+    assert (tmp_path / "new.jsonl").read_bytes() == b""
+
+
+@pytest.mark.parametrize("format", ["xmi", "json"])
+def test_uimacas_many(format, tmp_path):
+    cassis = pytest.importorskip("cassis")
+    strategy = anotate.UimaCasStrategy()
+    first = strategy.annotate("Dr DUPONT Jean", {((3, 14),): "<NAME>"})
+    second = strategy.annotate("né le 01/01/1970", {((6, 16),): "<DATE>"})
+    assert first.typesystem is second.typesystem is strategy.typesystem
+    assert [a.get_covered_text() for a in second.select("custom.NamedEntity")] == ["01/01/1970"]
+    assert pickle.loads(pickle.dumps(strategy)).type_name == "custom.NamedEntity"
+
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    ano.set_annotator("uimacas")
+    texts = [f"Dr DUPONT Jean, tél: 065156560{i}" for i in range(5)]
+    documents = [(f"doc{i}", text, None) for i, text in enumerate(texts)]
+    paths = ano.annotate_to_directory(documents, tmp_path / "cas", format=format, workers=2)
+    assert paths == [str(tmp_path / "cas" / f"doc{i}.{format}") for i in range(5)]
+    for path, text in zip(paths, texts):
+        with open(path, "rb") as f:
+            if format == "xmi":
+                typesystem = cassis.load_typesystem(tmp_path / "cas" / "TypeSystem.xml")
+                cas = cassis.load_cas_from_xmi(f, typesystem=typesystem)
+            else:
+                cas = cassis.load_cas_from_json(f)
+        assert cas.sofa_string == text
+        assert [a.label for a in cas.select("custom.NamedEntity")] == ["<NAME>", "<NUMBER>"]
+    with pytest.raises(Exception, match="csv format doesn't exist"):
+        ano.annotate_to_directory(documents, tmp_path, format="csv")
+
+
 def test_add_analyser_error():
     ano = Anonymizer()
     with pytest.raises(Exception, match="test analyzer doesn't exist"):
@@ -182,6 +474,7 @@ dataset_regex = {
 
 datas_regex = list(dataset_regex.values())
 ids_regex = list(dataset_regex.keys())
+differential_texts += [text for text, _ in datas_regex if text]
 
 
 @pytest.mark.parametrize("input,output", datas_regex, ids=ids_regex)
@@ -203,6 +496,7 @@ dataset_regex = {
 
 datas_regex = list(dataset_regex.values())
 ids_regex = list(dataset_regex.keys())
+differential_texts += [text for text, _ in datas_regex if text]
 
 
 @pytest.mark.parametrize("input,output", datas_regex, ids=ids_regex)
@@ -247,3 +541,518 @@ def test_get_entities(input, expected):
     ano.set_mask("placeholder")
     ano.anonymize(input)
     assert ano.get_entities() == expected
+
+
+def test_entity_table(tmp_path):
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    ano.add_analyzer("lossy")
+    text, expected = dataset_entities["multiple"]
+    ano.anonymize(text)
+    entities = ano.get_entities()
+    assert isinstance(entities, EntityTable)
+    assert len(entities) == 2 and entities[1] == expected[1]
+    assert entities[-1] == expected[-1]
+    assert entities[0:2] == expected[0:2] and entities[::-1] == expected[::-1]
+    assert entities[5:] == []
+    assert list(entities.rows()) == [
+        ("Jean DUPONT", "<NAME>", "NAME", 3, 14),
+        ("01/01/1970", "<DATE>", "DATE", 21, 31),
+    ]
+
+    entities.to_csv(tmp_path / "entities.csv")
+    with open(tmp_path / "entities.csv", encoding="utf-8") as f:
+        assert f.read().splitlines() == [
+            "original,replacement,type,start,end",
+            "Jean DUPONT,<NAME>,NAME,3,14",
+            "01/01/1970,<DATE>,DATE,21,31",
+        ]
+    stream = io.StringIO()
+    entities.to_jsonl(stream)
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == [
+        {"original": "Jean DUPONT", "replacement": "<NAME>", "type": "NAME", "start": 3, "end": 14},
+        {"original": "01/01/1970", "replacement": "<DATE>", "type": "DATE", "start": 21, "end": 31},
+    ]
+
+    ano.set_entity_capture(False)
+    assert ano.anonymize(text) == "Dr <NAME> né le <DATE>"
+    assert len(ano.get_entities()) == 0
+
+
+def test_entity_table_numpy():
+    numpy = pytest.importorskip("numpy")
+    entities = EntityTable()
+    entities.extend("Jean DUPONT le 01/01/1970", {((0, 11),): "<NAME>", ((15, 25),): "<DATE>"})
+    table = entities.to_numpy(originals=True)
+    assert table["start"].tolist() == [0, 15]
+    assert table["type"].tolist() == ["NAME", "DATE"]
+    assert table["original"].tolist() == ["Jean DUPONT", "01/01/1970"]
+    assert table.dtype["end"] == numpy.int64
+
+
+@pytest.mark.parametrize("pipeline", Anonymizer.PIPELINES)
+def test_offset_map(pipeline):
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    ano.add_analyzer("pii")
+    ano.set_pipeline(pipeline)
+    infos = PersonalInfo(first_name="Jean", last_name="DUPONT", ipp="0987654321")
+    text = "Dr Jean DUPONT (ipp 0987654321), tél: 0651565600, vu le 12/03/2021."
+    output, offsets = ano.anonymize_with_offsets(text, infos)
+    assert output == ano.anonymize(text, infos)
+
+    replaced = [range(start, end) for start, end, _, _ in offsets]
+    for position, char in enumerate(text):
+        if not any(position in span for span in replaced):
+            assert output[offsets.to_target(position)] == char
+            assert offsets.to_source(offsets.to_target(position)) == position
+    for start, end, target_start, target_end in offsets:
+        assert text[start:end] in ("Jean DUPONT", "0987654321", "0651565600", "12/03/2021")
+        assert offsets.to_target(start) == target_start
+        assert offsets.to_source(target_end - 1) == start
+    assert offsets.to_target(len(text)) == len(output)
+
+
+def test_offset_map_compose():
+    first, second = mask.OffsetMap(), mask.OffsetMap()
+    placeholder = mask.PlaceholderStrategy()
+    text = "Jean DUPONT tél 0651565600"
+    step = placeholder.mask(text, {((5, 11),): "<NAME>"}, offsets=first)
+    output = placeholder.mask(step, {((0, 4), (16, 26)): "<X>"}, offsets=second)
+    assert output == "<X> <NAME> tél <X>"
+    composed = first.compose(second)
+    assert list(composed) == [(0, 4, 0, 3), (5, 11, 4, 10), (16, 26, 15, 18)]
+    # les spans jointifs ou chevauchants se fondent en un seul
+    third = mask.OffsetMap()
+    placeholder.mask(output, {((0, 10),): "<Y>"}, offsets=third)
+    assert list(composed.compose(third)) == [(0, 11, 0, 3), (16, 26, 8, 11)]
+
+
+def test_compiled_patterns_shared():
+    first = analyzer.RegexStrategy()
+    second = analyzer.LossyStrategy()
+    assert first.compiled_patterns is second.compiled_patterns
+    assert len(first.compiled_patterns) == len(first.PATTERNS)
+    assert second.compiled_lossy_patterns is analyzer.LossyStrategy().compiled_lossy_patterns
+
+
+def test_resolve_position_conflicts():
+    resolve = analyzer.RegexStrategy()._resolve_position_conflicts
+    # le span le plus large porte l'union, les autres spans de sa clé sont gardés
+    assert resolve({((0, 5), (10, 14)): "<NAME>", ((2, 9),): "<NAME>"}) == {
+        ((10, 14),): "<NAME>",
+        ((0, 9),): "<NAME>",
+    }
+    # à largeur égale, le premier span porte l'union
+    assert resolve({((3, 8),): "<NAME>", ((0, 5),): "<NAME>"}) == {((0, 8),): "<NAME>"}
+    # une chaîne de spans qui se chevauchent donne un seul span
+    assert resolve({((0, 4), (6, 10)): "<NAME>", ((3, 7),): "<NAME>"}) == {
+        ((0, 10),): "<NAME>"
+    }
+    # pas de conflit entre remplacements différents
+    positions = {((0, 5),): "<NAME>", ((3, 8),): "<DATE>"}
+    assert resolve(positions) == positions
+
+
+@pytest.mark.parametrize(
+    "strategy,text,expected",
+    [
+        # la 2e mention n'est plus perdue avec la clé de la 1re
+        (analyzer.RegexStrategy, "Le 23 août 1993 puis en août 1993.", "Le <DATE> puis en <DATE>."),
+        # "<NAME> Erwan" : un nom loin d'un span plus large reste masqué
+        (analyzer.LossyStrategy, "Professeur TANGUY Marie et Mme Marie TANGUY.", "<NAME> et <NAME>"),
+        (analyzer.LossyStrategy, "Dr Pierre LECLERC et Docteur ABGRALL Pierre.", "<NAME> et <NAME>."),
+        # les caractères d'un span plus court qui dépassent du plus large
+        # restent masqués
+        (analyzer.LossyStrategy, "Pierre ABGRALL Jean MARIE Jean TANGUY", "<NAME>"),
+        (analyzer.RegexStrategy, "DUPONT de Monsieur Dr J. Dr B. GALL vu", "DUPONT de Monsieur <NAME> <NAME> vu"),
+    ],
+)
+def test_resolve_position_conflicts_keeps_far_spans(strategy, text, expected):
+    positions = strategy().multi_subs_by_regex(text)
+    assert mask.PlaceholderStrategy().mask(text, positions) == expected
+
+
+def test_resolve_position_conflicts_no_overlap():
+    # "Margaret Hamiltonon" : deux spans chevauchants d'une même clé
+    # étaient remplacés l'un après l'autre
+    text = "Docteur Jean MARTIN et Monsieur Erwan LE GALL, puis Erwan."
+    positions = analyzer.LossyStrategy().multi_subs_by_regex(text)
+    spans = sorted(span for key in positions for span in key)
+    assert all(end <= start for (_, end), (start, _) in zip(spans, spans[1:]))
+    assert mask.PlaceholderStrategy().mask(text, positions) == (
+        "<NAME> et <NAME>, puis Erwan."
+    )
+
+
+def test_prefilter_matches_full_scan():
+    full = analyzer.RegexStrategy(prefilter=False)
+    prefiltered = analyzer.RegexStrategy()
+    for text in differential_texts + [text for text, _ in datas_entities]:
+        assert prefiltered.analyze(text) == full.analyze(text)
+
+
+def test_prefilter_skipped_families():
+    strategy = analyzer.RegexStrategy()
+    strategy.analyze("tél: 0651565600")
+    assert strategy.skipped_families == {"name", "date_litteral", "email", "adresse"}
+    strategy.analyze("Docteur DUPONT Jean, bob@gmail.com")
+    assert strategy.skipped_families == {"date_litteral", "adresse"}
+    strategy = analyzer.RegexStrategy(prefilter=False)
+    strategy.analyze("tél: 0651565600")
+    assert strategy.skipped_families == set()
+
+
+def test_remove_overlapping_spans():
+    strategy = analyzer.RegexStrategy()
+    spans = [(0, 4), (2, 10), (9, 12), (12, 15), (11, 13)]
+    assert strategy._remove_overlapping_spans(spans) == [(2, 10), (12, 15)]
+
+
+def test_span_store_merge():
+    store = analyzer.SpanStore()
+    store.add([(0, 4), (10, 14)], "<DATE>")
+    store.add([(20, 24)], "<NAME>")
+    store.add([(10, 14), (30, 34)], "<NUMBER>")
+    assert store.position == {
+        ((20, 24),): "<NAME>",
+        ((0, 4), (10, 14), (30, 34)): "<NUMBER>",
+    }
+
+
+def test_pattern_timeout_fallback():
+    strategy = analyzer.LossyStrategy(pattern_timeout=0.01)
+    with pytest.warns(RuntimeWarning, match="exceeded its time budget"):
+        strategy.multi_subs_by_regex("A" * 3000 + " Jean")
+    assert strategy.timeouts
+    assert {timeout.replacement for timeout in strategy.timeouts} == {"<NAME>"}
+
+
+def test_document_timeout_fallback():
+    strategy = analyzer.RegexStrategy(document_timeout=0)
+    with pytest.warns(RuntimeWarning):
+        spans = strategy.analyze("Dr JEAN Dupont, né le 12/03/2020")
+    assert spans == {((0, 14),): "<NAME>", ((22, 32),): "<DATE>"}
+    assert {timeout.replacement for timeout in strategy.timeouts} == {
+        "<NAME>",
+        "<DATE>",
+        "<ADRESSE>",
+        "<NUMBER>",
+    }
+
+
+def test_fallback_once_per_label(monkeypatch):
+    strategy = analyzer.RegexStrategy(document_timeout=0)
+    calls = []
+    fallback_spans = strategy._fallback_spans
+    monkeypatch.setattr(
+        strategy,
+        "_fallback_spans",
+        lambda text, repl: calls.append(repl) or fallback_spans(text, repl),
+    )
+    with pytest.warns(RuntimeWarning):
+        strategy.analyze("Dr JEAN Dupont, né le 12/03/2020")
+    assert sorted(calls) == sorted(set(calls))
+    assert len(strategy.timeouts) > len(calls)
+
+
+def test_profiling():
+    strategy = analyzer.RegexStrategy()
+    profiler = strategy.enable_profiling()
+    strategy.analyze("Dr DUPONT Jean né le 01/01/1970")
+    strategy.analyze("Dr DUPONT Jean")
+    stats = profiler.as_dict()
+    names = [entry for entry in stats.values() if entry["label"] == "<NAME>"]
+    assert {entry["calls"] for entry in names} == {2}
+    assert sum(entry["kept"] for entry in names) >= 2
+    assert [entry["kept"] for entry in stats.values() if entry["label"] == "<DATE>"] == [1]
+    assert all(entry["kept"] <= entry["matches"] for entry in stats.values())
+    assert json.loads(profiler.to_json()) == stats
+
+    pii = analyzer.PiiStrategy()
+    pii.enable_profiling()
+    pii.analyze("Lea Jungels", PersonalInfo(first_name="Lea", last_name="Jungels"))
+    assert pii.profiler.as_dict()["keywords"]["matches"] == 2
+
+
+def test_pii_processor_cache():
+    strategy = analyzer.PiiStrategy(cache_size=1)
+    lea = PersonalInfo(**infos)
+    other = PersonalInfo(first_name="Jean", last_name="Dupont")
+    for _ in range(3):
+        assert strategy.analyze("Léa Jungels", lea) == {
+            ((0, 3),): "<NAME>",
+            ((4, 11),): "<NAME>",
+        }
+    assert strategy.cache_info() == {"hits": 2, "misses": 1, "size": 1, "maxsize": 1}
+    strategy.analyze("Jean Dupont", other)
+    strategy.analyze("Léa Jungels", lea)
+    assert strategy.cache_info()["misses"] == 3
+    strategy.invalidate(lea)
+    assert strategy.cache_info()["size"] == 0
+
+
+
+@pytest.mark.parametrize(
+    "text, first_name",
+    [
+        ("Patiente Léa Jungels, vue par Jungels.", "Léa"),
+        (unicodedata.normalize("NFD", "Patiente Léa Jungels, vu par Jungels."), "Léa"),
+        ("Patiente 한국 Léa Jungels, vue par Jungels.", "Léa"),
+        ("Patiente Léá Jungels, vue par Jungels.", "Léá"),
+    ],
+)
+def test_pii_spans_on_original_text(text, first_name):
+    strategy = analyzer.PiiStrategy()
+    result = strategy.analyze(text, PersonalInfo(**infos))
+    words = sorted(text[start:end] for ((start, end),) in result)
+    words = [unicodedata.normalize("NFC", word) for word in words]
+    assert words == ["Jungels", "Jungels", first_name]
+
+
+def test_patient_registry(tmp_path):
+    path = tmp_path / "patients.csv"
+    path.write_text(
+        "ipp,first_name,last_name,birthdate,postal_code\n"
+        "0987654321,Léa,Jungels,1992-09-22,01000\n"
+        "42,Jean,DUPONT,,\n",
+        encoding="utf-8",
+    )
+    registry = analyzer.PatientRegistry.from_csv(path)
+    assert len(registry) == 2 and "42" in registry and "43" not in registry
+    strategy = analyzer.PiiStrategy()
+    assert registry.keywords("0987654321") == tuple(
+        (analyzer.fold_accents(word)[0], replacement)
+        for word, replacement in strategy.keywords(PersonalInfo(**infos))
+    )
+    assert registry["0987654321"].birthdate == infos["birthdate"]
+
+    ano = Anonymizer()
+    ano.add_analyzer("pii")
+    ano.set_registry(registry)
+    for text, output in datas_pii:
+        assert ano.anonymize(text, "0987654321") == output
+    assert ano.anonymize("Jean DUPONT", "42") == "<NAME> <NAME>"
+
+    jsonl = tmp_path / "patients.jsonl"
+    jsonl.write_text('{"ipp": 42, "first_name": "Marc"}\n', encoding="utf-8")
+    assert analyzer.PatientRegistry.from_jsonl(jsonl)["42"].first_name == "Marc"
+    # un patient ajouté de nouveau est remplacé
+    registry.extend([{"ipp": "42", "first_name": "Marc"}])
+    assert len(registry) == 2
+    assert ano.anonymize("Jean Marc", "42") == "Jean <NAME>"
+    with pytest.raises(Exception, match="43 patient doesn't exist"):
+        ano.anonymize("Jean", "43")
+    with pytest.raises(ValueError, match="record 1: unknown fields"):
+        analyzer.PatientRegistry([{"ipp": "1", "age": "3"}])
+    with pytest.raises(ValueError, match="record 2: invalid birthdate"):
+        analyzer.PatientRegistry([{"ipp": "1"}, {"ipp": "2", "birthdate": "22/09/1992"}])
+
+
+def test_gazetteer(tmp_path):
+    path = tmp_path / "registre.csv"
+    path.write_text("Martin\nJean Martin,<NAME>\n123456,<IPP>\n", encoding="utf-8")
+    gazetteer = analyzer.Gazetteer.from_csv(str(path))
+    assert len(gazetteer) == 3
+    assert "martin" in gazetteer
+
+    strategy = analyzer.PiiStrategy(gazetteer=gazetteer)
+    text = "Léa Jungels, fille de Jean Martin (IPP 123456)."
+    assert strategy.analyze(text, None) == {
+        ((22, 33),): "<NAME>",
+        ((39, 45),): "<IPP>",
+    }
+    assert strategy.analyze(text, PersonalInfo(**infos)) == {
+        ((0, 3),): "<NAME>",
+        ((4, 11),): "<NAME>",
+        ((22, 33),): "<NAME>",
+        ((39, 45),): "<IPP>",
+    }
+
+    gazetteer.add("Léa Jungels")
+    assert strategy.analyze(text, PersonalInfo(**infos))[((0, 11),)] == "<NAME>"
+
+    ano = Anonymizer()
+    ano.set_gazetteer(gazetteer)
+    ano.add_analyzer("pii")
+    assert ano.anonymize(text, PersonalInfo(**infos)) == "<NAME>, fille de <NAME> (IPP <IPP>)."
+
+
+def test_mapped_gazetteer(tmp_path):
+    gazetteer = analyzer.Gazetteer(
+        [("Martin", "<NAME>"), ("Jean Martin", "<NAME>"), ("123456", "<IPP>"), ("Hélène", "<NAME>")]
+    )
+    path = str(tmp_path / "registre.bin")
+    gazetteer.save(path)
+    text = "Jean Martin, Martins et Hélène MARTIN (IPP 123456, 1234567)."
+    with analyzer.MappedGazetteer(path) as mapped:
+        assert len(mapped) == 4
+        assert "jean martin" in mapped and "Helene" in mapped and "Jean" not in mapped
+        folded, _ = analyzer.fold_accents(text)
+        assert mapped.extract_keywords(folded, span_info=True) == gazetteer.extract_keywords(
+            folded, span_info=True
+        )
+        strategy = analyzer.PiiStrategy(gazetteer=mapped)
+        assert strategy.analyze(text, None) == analyzer.PiiStrategy(gazetteer=gazetteer).analyze(
+            text, None
+        )
+
+    (tmp_path / "other.bin").write_bytes(b"not a gazetteer" * 4)
+    with pytest.raises(ValueError):
+        analyzer.MappedGazetteer(str(tmp_path / "other.bin"))
+
+
+def test_single_pass_pipeline():
+    text = "Madame Léa Jungels, née le 01/01/2000, léa.jungels@chu.fr. Jungels va bien."
+    sequential = Anonymizer()
+    single_pass = Anonymizer()
+    single_pass.set_pipeline("single_pass")
+    for ano in (sequential, single_pass):
+        ano.add_analyzer("regex")
+        ano.add_analyzer("pii")
+    info = PersonalInfo(**infos)
+    # en séquentiel, le pattern email ne couvre pas "lé" et pii ne retrouve
+    # plus "léa" dans le texte déjà masqué
+    assert sequential.anonymize(text, info) == (
+        "Madame <NAME>, née le <DATE>, lé<EMAIL>. <NAME> va bien."
+    )
+    assert single_pass.anonymize(text, info) == (
+        "Madame <NAME>, née le <DATE>, <EMAIL>. <NAME> va bien."
+    )
+    entities = single_pass.get_entities()
+    assert entities and all(text[e.start:e.end] == e.original for e in entities)
+
+    with pytest.raises(Exception):
+        single_pass.set_pipeline("parallel")
+
+
+def test_merge_spans():
+    merged = Anonymizer._merge_spans(
+        [
+            {((0, 5), (10, 12)): "<NAME>"},
+            {((3, 8),): "<ADRESSE>", ((20, 22),): "<DATE>", ((10, 12),): "<IPP>"},
+        ]
+    )
+    assert merged == {
+        ((0, 8),): "<NAME>",
+        ((10, 12),): "<NAME>",
+        ((20, 22),): "<DATE>",
+    }
+
+
+def test_anonymize_many(tmp_path):
+    path = str(tmp_path / "registre.bin")
+    analyzer.Gazetteer([("Martin", "<NAME>")]).save(path)
+    ano = Anonymizer()
+    ano.set_gazetteer(analyzer.MappedGazetteer(path))
+    ano.add_analyzer("regex")
+    ano.add_analyzer("pii")
+    ano.set_info(PersonalInfo(**infos))
+    documents = [
+        (f"Docteur Jean Martin voit Léa Jungels ({i}) le 0{i % 9 + 1}/01/2020.", None)
+        for i in range(20)
+    ]
+    documents[3] = ("Martin et Paul Dupont", PersonalInfo(first_name="Paul", last_name="Dupont"))
+    expected = [ano.anonymize(text, info) for text, info in documents]
+
+    assert list(ano.anonymize_many(documents, workers=2, chunksize=3, max_in_flight=2)) == expected
+    completed = ano.anonymize_many(iter(documents), workers=2, ordered=False, chunksize=4)
+    assert sorted(completed) == list(enumerate(expected))
+
+
+def test_analysis_state():
+    strategy = analyzer.RegexStrategy()
+    first, second = analyzer.AnalysisState(), analyzer.AnalysisState()
+    strategy.analyze("Monsieur Jean Dupont", state=first)
+    strategy.analyze("jean@chu.fr", state=second)
+    assert first.position and first.position != second.position
+    assert first.skipped_families == {"date_litteral", "email", "adresse"}
+    assert second.skipped_families == {"name", "date_litteral", "adresse"}
+    assert strategy.position == second.position
+
+
+def test_shared_anonymizer_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    ano.add_analyzer("pii")
+    documents = [
+        (f"Docteur Jean Dupont{'X' * (i % 5)} voit Léa Jungels le {i % 28 + 1}/01/2020.",
+         PersonalInfo(**infos) if i % 2 else PersonalInfo(first_name="Jean"))
+        for i in range(60)
+    ]
+    expected = [ano.anonymize_with_entities(text, info) for text, info in documents]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda doc: ano.anonymize_with_entities(*doc), documents))
+    assert results == expected
+    assert list(ano.anonymize_many(documents, workers=4, executor="thread")) == [
+        text for text, _ in expected
+    ]
+    # erreurs levées à l'appel, sans itérer le résultat
+    with pytest.raises(Exception, match="gpu executor doesn't exist"):
+        ano.anonymize_many(documents, executor="gpu")
+    with pytest.raises(ValueError, match="workers must be at least 1"):
+        ano.anonymize_many(documents, workers=0)
+    with pytest.raises(ValueError, match="chunksize must be at least 1"):
+        ano.anonymize_many(documents, chunksize=-2)
+
+
+def test_anonymize_async():
+    import asyncio
+
+    ano = Anonymizer()
+    ano.add_analyzer("regex")
+    ano.add_analyzer("pii")
+    ano.set_async_workers(2)
+    documents = [
+        (f"Monsieur Jean Dupont{i} voit Léa Jungels le {i % 28 + 1}/01/2020.", PersonalInfo(**infos))
+        for i in range(10)
+    ]
+    expected = [ano.anonymize(text, info) for text, info in documents]
+    pulled = []
+
+    async def source():
+        for i, document in enumerate(documents):
+            pulled.append(i)
+            yield document
+
+    async def main():
+        assert await ano.anonymize_async(*documents[0]) == expected[0]
+        assert [text async for text in ano.anonymize_stream(documents)] == expected
+        unordered = [item async for item in ano.anonymize_stream(source(), ordered=False)]
+        assert sorted(unordered) == list(enumerate(expected))
+
+        # backpressure : la source n'est lue qu'au rythme du consommateur
+        pulled.clear()
+        stream = ano.anonymize_stream(source())
+        assert await stream.__anext__() == expected[0]
+        assert len(pulled) <= 3
+        await stream.aclose()
+
+        task = asyncio.ensure_future(ano.anonymize_async(*documents[1]))
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    ano.close()
+
+
+@pytest.mark.parametrize("pipeline", Anonymizer.PIPELINES)
+def test_anonymize_chunks(pipeline, tmp_path):
+    ano = Anonymizer()
+    ano.set_pipeline(pipeline)
+    ano.add_analyzer("regex")
+    ano.add_analyzer("pii")
+    ano.set_info(PersonalInfo(**infos))
+    text = "\n".join(differential_texts + [text for text, _ in datas_entities]) * 3
+    expected = ano.anonymize(text)
+    chunks = [text[i : i + 97] for i in range(0, len(text), 97)]
+    assert "".join(ano.anonymize_chunks(chunks, window=300, overlap=150)) == expected
+    assert "".join(ano.anonymize_chunks([""])) == ano.anonymize("")
+
+    source, output = tmp_path / "in.txt", tmp_path / "out.txt"
+    source.write_text(text)
+    ano.anonymize_file(str(source), str(output), window=500, overlap=200)
+    assert output.read_text() == expected